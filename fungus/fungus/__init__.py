@@ -0,0 +1,61 @@
+"""Fungus: pluggable observability layer for Python.
+
+Importing the package has no side effects: subsystems are loaded on first
+attribute access (``fungus.record_event``, ``fungus.auto_inject`` ...) and
+log folders are created on first write.
+"""
+import importlib
+
+# public name -> module that defines it
+_LAZY_ATTRS = {
+    "record_event": "fungus.blackbox_agent",
+    "record_error_event": "fungus.blackbox_agent",
+    "set_ctx": "fungus.blackbox_agent",
+    "get_ctx": "fungus.blackbox_agent",
+    "BlackboxAgent": "fungus.blackbox_agent",
+    "BLACKBOX_SETTINGS": "fungus.blackbox_config",
+    "BLACKBOX_PATH": "fungus.blackbox_config",
+    "LOG_PATHS": "fungus.blackbox_config",
+    "write_blackbox_log": "fungus.blackbox_writer",
+    "writer_status": "fungus.blackbox_writer",
+    "tag_for_context": "fungus.blackbox_tag_engine",
+    "blackbox_wrap": "fungus.blackbox_infect",
+    "blackbox_exclude": "fungus.blackbox_infect",
+    "auto_inject": "fungus.blackbox_injector",
+    "wrap_module_functions": "fungus.blackbox_injector",
+    "run_retention_policy": "fungus.blackbox_retention",
+    "archive_layer1": "fungus.blackbox_retention",
+    "train_tags": "fungus.blackbox_tag_trainer",
+    "compact_logs": "fungus.blackbox_compactor",
+    "read_compacted": "fungus.blackbox_compactor",
+    "read_tenant_logs": "fungus.blackbox_shards",
+    "resolve_event": "fungus.blackbox_metadata",
+    "merge_logs": "fungus.blackbox_merge",
+    "detect_regressions": "fungus.blackbox_regress",
+    "configure_sinks": "fungus.blackbox_sinks",
+    "flush_sinks": "fungus.blackbox_sinks",
+    "close_sinks": "fungus.blackbox_sinks",
+    "flush_flight_recorder": "fungus.blackbox_recorder",
+    "stats": "fungus.blackbox_stats"
+}
+
+__all__ = sorted(_LAZY_ATTRS)
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is not None:
+        value = getattr(importlib.import_module(module_name), name)
+        globals()[name] = value
+        return value
+    if name.startswith("blackbox_"):
+        try:
+            return importlib.import_module(f"{__name__}.{name}")
+        except ModuleNotFoundError as e:
+            if e.name != f"{__name__}.{name}":
+                raise
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
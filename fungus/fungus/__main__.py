@@ -0,0 +1,25 @@
+"""Command line entry point: python -m fungus <command> ..."""
+import argparse
+import sys
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="fungus", description="Fungus log tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    from fungus import blackbox_merge, blackbox_regress
+
+    merge = commands.add_parser("merge", help="merge several hosts' logs into one __ts__-ordered timeline")
+    blackbox_merge.add_arguments(merge)
+    merge.set_defaults(run=blackbox_merge.run)
+
+    regress = commands.add_parser("regress", help="rank per-function p50/p99 latency regressions between two log windows")
+    blackbox_regress.add_arguments(regress)
+    regress.set_defaults(run=blackbox_regress.run)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
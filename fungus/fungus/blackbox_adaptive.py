@@ -0,0 +1,209 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from fungus.blackbox_config import BLACKBOX_SETTINGS, LOG_PATHS
+
+
+# === Adaptive Wrapping ===
+DEFAULT_ADAPTIVE = {
+    "enabled": False,
+    "warmup_calls": 200,
+    "min_cost_ratio": 1.0,
+    "counter_calls": 1000
+}
+
+ADAPTIVE_DECISIONS_PATH = os.path.join(LOG_PATHS["internal"], "adaptive_decisions.json")
+
+MODE_FULL = "full"
+MODE_COUNTERS = "counters"
+MODE_UNWRAPPED = "unwrapped"
+
+_decisions = None
+_decisions_lock = threading.Lock()
+_frames = threading.local()
+
+
+def _adaptive_config():
+    return {**DEFAULT_ADAPTIVE, **BLACKBOX_SETTINGS.get("adaptive_wrapping", {})}
+
+
+def adaptive_enabled():
+    return bool(_adaptive_config().get("enabled"))
+
+
+def function_key(func):
+    """Stable key used to persist decisions across restarts."""
+    module = getattr(func, "__module__", None) or "unknown"
+    name = getattr(func, "__qualname__", None) or getattr(func, "__name__", "unknown")
+    return f"{module}.{name}"
+
+
+def _load_decisions():
+    global _decisions
+    if _decisions is None:
+        decisions = {}
+        if os.path.exists(ADAPTIVE_DECISIONS_PATH):
+            try:
+                with open(ADAPTIVE_DECISIONS_PATH, "r", encoding="utf-8") as f:
+                    decisions = json.load(f) or {}
+            except (OSError, ValueError) as e:
+                print(f"[Adaptive] Failed to load decisions from {ADAPTIVE_DECISIONS_PATH}: {e}")
+        _decisions = decisions
+    return _decisions
+
+
+def _save_decision(key, decision):
+    with _decisions_lock:
+        decisions = _load_decisions()
+        decisions[key] = decision
+        try:
+            os.makedirs(os.path.dirname(ADAPTIVE_DECISIONS_PATH), exist_ok=True)
+            tmp_path = ADAPTIVE_DECISIONS_PATH + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(decisions, f, indent=2)
+            os.replace(tmp_path, ADAPTIVE_DECISIONS_PATH)
+        except OSError as e:
+            print(f"[Adaptive] Failed to persist decision for {key}: {e}")
+
+
+def should_skip_wrapping(func):
+    """True if a previous run decided this function is cheaper than its instrumentation."""
+    if not adaptive_enabled():
+        return False
+    decision = _load_decisions().get(function_key(func))
+    return bool(decision) and decision.get("mode") == MODE_UNWRAPPED
+
+
+def reset_decisions():
+    """Forget all persisted decisions so every function is wrapped again on next startup."""
+    global _decisions
+    with _decisions_lock:
+        _decisions = {}
+        try:
+            os.remove(ADAPTIVE_DECISIONS_PATH)
+        except FileNotFoundError:
+            pass
+
+
+class WrapState:
+    """Per-wrapper cost accounting that demotes functions cheaper than their instrumentation.
+
+    During the warm-up window the wrapper measures the wrapped function's self time
+    (excluding nested wrapped calls) and its own bookkeeping overhead (previews, tracemalloc,
+    context), leaving out the time record_event spends writing, which is disk noise rather
+    than a property of the function. If self time / overhead falls under ``min_cost_ratio``
+    the wrapper drops to counters only, and once ``counter_calls`` further calls have been
+    counted the original function is restored in its owner.
+
+    The settings are read once per state; reload_config() picks up changes.
+    """
+
+    __slots__ = ("func", "key", "mode", "calls", "self_time", "overhead", "counted", "wrapper", "config")
+
+    def __init__(self, func):
+        self.func = func
+        self.key = function_key(func)
+        self.mode = MODE_FULL
+        self.calls = 0
+        self.self_time = 0.0
+        self.overhead = 0.0
+        self.counted = 0
+        self.wrapper = None
+        self.config = _adaptive_config()
+
+    def reload_config(self):
+        self.config = _adaptive_config()
+
+    @property
+    def measuring(self):
+        return self.mode == MODE_FULL and self.calls < self.config["warmup_calls"]
+
+    def enter(self):
+        # [time spent in nested wrapped calls, call start, call end, time spent in record_event]
+        frame = [0.0, None, None, 0.0]
+        stack = getattr(_frames, "stack", None)
+        if stack is None:
+            stack = _frames.stack = []
+        stack.append(frame)
+        return frame
+
+    def leave(self, frame, enter_time):
+        end_time = time.perf_counter()
+        stack = _frames.stack
+        if stack and stack[-1] is frame:
+            stack.pop()
+        if stack:
+            stack[-1][0] += end_time - enter_time
+
+        call_start, call_end = frame[1], frame[2]
+        if call_start is None or call_end is None:
+            return
+
+        inclusive = call_end - call_start
+        self.self_time += max(inclusive - frame[0], 0.0)
+        self.overhead += max((end_time - enter_time) - inclusive - frame[3], 0.0)
+        self.calls += 1
+
+        if self.calls >= self.config["warmup_calls"]:
+            self._decide()
+
+    def tick(self):
+        """Counts a call made while demoted and unwraps once the counter window is full."""
+        self.counted += 1
+        if self.mode == MODE_COUNTERS and self.counted >= self.config["counter_calls"]:
+            self._unwrap()
+
+    def _ratio(self):
+        if self.overhead <= 0:
+            return float("inf")
+        return self.self_time / self.overhead
+
+    def _summary(self):
+        return {
+            "function": self.key,
+            "mode": self.mode,
+            "ratio": round(self._ratio(), 4),
+            "avg_self_time_us": round(self.self_time / max(self.calls, 1) * 1e6, 3),
+            "avg_overhead_us": round(self.overhead / max(self.calls, 1) * 1e6, 3),
+            "measured_calls": self.calls,
+            "counted_calls": self.counted
+        }
+
+    def _decide(self):
+        if self.mode != MODE_FULL or self._ratio() >= self.config["min_cost_ratio"]:
+            return
+        self.mode = MODE_COUNTERS
+        _report("[Adaptive] Demoted to counters", self._summary())
+
+    def _unwrap(self):
+        from fungus.blackbox_injector import restore_original
+
+        self.mode = MODE_UNWRAPPED
+        restored = self.wrapper is not None and restore_original(self.wrapper)
+        summary = self._summary()
+        summary["restored"] = bool(restored)
+        _save_decision(self.key, {**summary, "decided_at": datetime.utcnow().isoformat()})
+        _report("[Adaptive] Unwrapped", summary)
+
+
+def timed_recorder(record_event, frame):
+    """record_event that adds its own duration to frame[3], used while a call is being measured."""
+    def record(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return record_event(*args, **kwargs)
+        finally:
+            frame[3] += time.perf_counter() - started
+    return record
+
+
+def _report(tag, content):
+    from fungus.blackbox_agent import record_event
+
+    try:
+        record_event("internal", tag=tag, content=content)
+    except Exception as e:
+        print(f"[Adaptive] Failed to record decision for {content.get('function')}: {e}")
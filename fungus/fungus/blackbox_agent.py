@@ -1,13 +1,20 @@
 import importlib
-import uuid
 from contextvars import ContextVar
 from datetime import datetime
-from pathlib import Path
+from time import perf_counter
 
-import yaml
+
+_config_cache = None
 
 
 def _load_config():
+    global _config_cache
+    if _config_cache is not None:
+        return _config_cache
+
+    import yaml
+    from pathlib import Path
+
     anchor = "dynamics/config.yaml"
     current = Path(__file__).resolve().parent
     for parent in [current] + list(current.parents):
@@ -17,7 +24,8 @@ def _load_config():
     else:
         raise FileNotFoundError(f"Could not locate project root via anchor: {anchor}")
     with open(root / anchor, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f), root
+        _config_cache = (yaml.safe_load(f), root)
+    return _config_cache
 
 
 def resolve_path(alias):
@@ -45,10 +53,33 @@ def resolve_module(name):
     return importlib.import_module(dotted)
 
 
-# Dynamically resolved imports
-BLACKBOX_SETTINGS = resolve_import("blackbox_settings")
-write_blackbox_log = resolve_import("write_blackbox_log")
-tag_for_context = resolve_import("tag_for_context")
+# Dynamically resolved imports, looked up on first use so importing the agent stays cheap
+_LAZY_IMPORTS = {
+    "BLACKBOX_SETTINGS": "blackbox_settings",
+    "write_blackbox_log": "write_blackbox_log",
+    "tag_for_context": "tag_for_context",
+    "define_function": "define_function",
+    "metadata_enabled": "metadata_enabled",
+    "capture": "capture_event",
+    "recorder_enabled": "recorder_enabled",
+    "incr": "incr_stat",
+    "observe": "observe_stat"
+}
+_resolved = {}
+
+
+def _resolved_import(name):
+    try:
+        return _resolved[name]
+    except KeyError:
+        value = _resolved[name] = resolve_import(_LAZY_IMPORTS[name])
+        return value
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        return _resolved_import(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # Context-local variable
@@ -63,15 +94,18 @@ def get_ctx():
     return _current_ctx.get()
 
 
-def record_event(log_type, ctx=None, tag=None, content=None, level="info", visibility="internal", log_id=None):
-    if not BLACKBOX_SETTINGS.get("write_logs", True):
-        return
+def _compact_payload(content, func):
+    """Swaps the function object and its docstring for the metadata dictionary id."""
+    payload = {k: v for k, v in content.items() if k != "__func__" and k != "doc"}
+    payload["__fid__"] = _resolved_import("define_function")(func)
+    return payload
 
-    ctx = ctx or get_ctx()
-    tag = tag or "event"
-    timestamp = datetime.utcnow().isoformat()
 
-    event = {
+def _build_event(log_type, ctx, tag, content, level, log_id, timestamp):
+    func = content.get("__func__") if isinstance(content, dict) else None
+    if func is not None and _resolved_import("metadata_enabled")():
+        content = _compact_payload(content, func)
+    return {
         "__ts__": timestamp,
         "subsystem": log_type,
         "tag": tag,
@@ -84,14 +118,34 @@ def record_event(log_type, ctx=None, tag=None, content=None, level="info", visib
         "log_id": log_id,
         "payload": content or {},
         # Optional tagging logic for context-aware logs
-        "tags": tag_for_context(
-            obj=content.get("__func__") if isinstance(content, dict) and "__func__" in content else None,
+        "tags": _resolved_import("tag_for_context")(
+            obj=func,
             ctx=ctx,
             result=content
         )
     }
 
-    write_blackbox_log(log_type, event, visibility=visibility)
+
+def record_event(log_type, ctx=None, tag=None, content=None, level="info", visibility="internal", log_id=None):
+    if not _resolved_import("BLACKBOX_SETTINGS").get("write_logs", True):
+        return
+
+    start = perf_counter()
+    ctx = ctx or get_ctx()
+    tag = tag or "event"
+    timestamp = datetime.utcnow().isoformat()
+
+    try:
+        # Flight-recorder mode keeps events in memory until an error, slow call, signal or shutdown
+        if _resolved_import("recorder_enabled")():
+            _resolved_import("capture")(log_type, ctx, tag, content, level, visibility, log_id, timestamp)
+            return
+
+        event = _build_event(log_type, ctx, tag, content, level, log_id, timestamp)
+        _resolved_import("write_blackbox_log")(log_type, event, visibility=visibility)
+    finally:
+        _resolved_import("incr")("record_event_total")
+        _resolved_import("observe")("record_event_seconds", perf_counter() - start)
 
 
 def record_error_event(log_type, ctx=None, tag=None, content=None, visibility="internal"):
@@ -108,12 +162,16 @@ class BlackboxAgent:
 
     # Optional: Use if your system tracks projects
     def generate_project_id(self, label=None):
+        import uuid
+
         date_str = datetime.utcnow().strftime("%Y%m%d")
         suffix = uuid.uuid4().hex[:6]
         return f"proj-{date_str}-{suffix}"
 
     # Optional: Use if your system tracks tasks
     def generate_task_id(self, prefix="task"):
+        import uuid
+
         timestamp = datetime.utcnow().strftime("%H%M%S")
         suffix = uuid.uuid4().hex[:5]
         return f"{prefix}-{timestamp}-{suffix}"
@@ -129,5 +187,5 @@ class BlackboxAgent:
             "extra": extra or {}
         }
 
-        if BLACKBOX_SETTINGS.get("write_logs", True):
-            write_blackbox_log("contextual_link", entry)
+        if _resolved_import("BLACKBOX_SETTINGS").get("write_logs", True):
+            _resolved_import("write_blackbox_log")("contextual_link", entry)
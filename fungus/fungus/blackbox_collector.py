@@ -0,0 +1,165 @@
+import argparse
+import gzip
+import json
+import os
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# === Local Stand-in Collector ===
+class LocalCollector:
+    """Minimal OTLP/HTTP + datagram receiver for exercising the exporter sinks locally.
+
+    Received events are kept in memory (``records``); OTLP log records are unwrapped
+    back to the original JSON line so they compare directly with the JSONL output.
+    """
+
+    def __init__(self, host="127.0.0.1", http_port=0, udp_port=0, unix_path=None, fail_first=0):
+        self.host = host
+        self.records = []
+        self.requests = 0
+        self.connections = set()
+        self.fail_first = fail_first
+        self._lock = threading.Lock()
+        self._http = ThreadingHTTPServer((host, http_port), self._handler())
+        self._http.daemon_threads = True
+        self._udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._udp.bind((host, udp_port))
+        self._unix = None
+        self.unix_path = unix_path
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+            self._unix = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._unix.bind(unix_path)
+        self._threads = []
+
+    @property
+    def http_endpoint(self):
+        return f"http://{self.host}:{self._http.server_address[1]}/v1/logs"
+
+    @property
+    def udp_address(self):
+        return f"udp://{self.host}:{self._udp.getsockname()[1]}"
+
+    @property
+    def unix_address(self):
+        return f"unix://{self.unix_path}" if self.unix_path else None
+
+    def _handler(self):
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                with collector._lock:
+                    collector.requests += 1
+                    collector.connections.add(self.client_address)
+                    failing = collector.fail_first > 0
+                    if failing:
+                        collector.fail_first -= 1
+                if failing:
+                    self._respond(503)
+                    return
+                try:
+                    if self.headers.get("Content-Encoding") == "gzip":
+                        body = gzip.decompress(body)
+                    payload = json.loads(body)
+                except (OSError, ValueError):
+                    self._respond(400)
+                    return
+                collector._add_otlp(payload)
+                self._respond(200)
+
+            def _respond(self, status):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _add_otlp(self, payload):
+        records = []
+        for resource_logs in payload.get("resourceLogs", []):
+            for scope_logs in resource_logs.get("scopeLogs", []):
+                for record in scope_logs.get("logRecords", []):
+                    body = record.get("body", {}).get("stringValue", "")
+                    try:
+                        records.append(json.loads(body))
+                    except ValueError:
+                        records.append({"__raw__": body})
+        with self._lock:
+            self.records.extend(records)
+
+    def _receive(self, sock):
+        while True:
+            try:
+                data = sock.recv(65536)
+            except OSError:
+                return
+            lines = [line for line in data.decode("utf-8", "replace").split("\n") if line]
+            with self._lock:
+                for line in lines:
+                    try:
+                        self.records.append(json.loads(line))
+                    except ValueError:
+                        self.records.append({"__raw__": line})
+
+    def start(self):
+        self._threads = [threading.Thread(target=self._http.serve_forever, daemon=True),
+                         threading.Thread(target=self._receive, args=(self._udp,), daemon=True)]
+        if self._unix is not None:
+            self._threads.append(threading.Thread(target=self._receive, args=(self._unix,), daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self._http.shutdown()
+        self._http.server_close()
+        for sock in (self._udp, self._unix):
+            if sock is not None:
+                sock.close()
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.remove(self.unix_path)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in collector for Fungus sinks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--http-port", type=int, default=4318)
+    parser.add_argument("--udp-port", type=int, default=5140)
+    parser.add_argument("--unix-path")
+    args = parser.parse_args()
+
+    collector = LocalCollector(args.host, args.http_port, args.udp_port, args.unix_path).start()
+    print(f"[Collector] OTLP/HTTP on {collector.http_endpoint}, datagrams on {collector.udp_address}")
+    seen = 0
+    try:
+        while True:
+            threading.Event().wait(1.0)
+            with collector._lock:
+                fresh = collector.records[seen:]
+                seen = len(collector.records)
+            for record in fresh:
+                print(json.dumps(record, ensure_ascii=False))
+    except KeyboardInterrupt:
+        collector.stop()
+
+
+if __name__ == "__main__":
+    main()
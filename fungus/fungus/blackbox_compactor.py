@@ -0,0 +1,263 @@
+import gzip
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: compaction runs are not serialised across processes
+    fcntl = None
+
+from fungus.blackbox_config import BLACKBOX_PATH, BLACKBOX_SETTINGS
+from fungus.blackbox_metadata import resolve_event
+
+
+# === Small-File Compaction ===
+DEFAULT_COMPACTION = {
+    "small_file_kb": 256,
+    "min_idle_sec": 3600,
+    "segment_max_mb": 64,
+    "max_files_per_run": 5000
+}
+
+SEGMENTS_DIR = os.path.join(BLACKBOX_PATH, "segments")
+CLAIM_SUFFIX = ".compacting"
+_DAY_FILE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.jsonl(" + re.escape(CLAIM_SUFFIX) + r")?$")
+
+
+def _compaction_config():
+    return {**DEFAULT_COMPACTION, **BLACKBOX_SETTINGS.get("compaction", {})}
+
+
+def _scan_dirs(path, prefix):
+    try:
+        with os.scandir(path) as entries:
+            return [(e.name[len(prefix):], e.path) for e in entries if e.is_dir() and e.name.startswith(prefix)]
+    except OSError:
+        return []
+
+
+def find_compaction_candidates(config=None):
+    """Yields closed, small per-task day files: older than today, idle, and under the size limit."""
+    config = config or _compaction_config()
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    idle_before = time.time() - config["min_idle_sec"]
+    max_bytes = config["small_file_kb"] * 1024
+
+    for user_id, user_path in _scan_dirs(BLACKBOX_PATH, "user_"):
+        for project_id, project_path in _scan_dirs(user_path, "project_"):
+            for task_id, task_path in _scan_dirs(project_path, "task_"):
+                for log_type, type_path in _scan_dirs(task_path, ""):
+                    try:
+                        entries = list(os.scandir(type_path))
+                    except OSError:
+                        continue
+                    for entry in entries:
+                        match = _DAY_FILE_RE.match(entry.name)
+                        if not match or match.group(1) >= today:
+                            continue
+                        claimed = bool(match.group(2))
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        if not claimed and (stat.st_mtime > idle_before or stat.st_size > max_bytes):
+                            continue
+                        yield {
+                            "path": entry.path,
+                            "claimed": claimed,
+                            "user_id": user_id,
+                            "project_id": project_id,
+                            "task_id": task_id,
+                            "log_type": log_type,
+                            "date": match.group(1)
+                        }
+
+
+def _index_path(date):
+    return os.path.join(SEGMENTS_DIR, date, "index.jsonl")
+
+
+def _index_key(entry):
+    return (entry["user_id"], entry["project_id"], entry["task_id"], entry["log_type"])
+
+
+def load_segment_index(date):
+    """Index rows for one day: tenant/task/type -> segment file, byte offset and length."""
+    rows = []
+    try:
+        with open(_index_path(date), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return rows
+
+
+def _open_segment(date, log_type, config):
+    day_dir = os.path.join(SEGMENTS_DIR, date)
+    os.makedirs(day_dir, exist_ok=True)
+    prefix = f"{log_type}-"
+    numbers = [
+        int(name[len(prefix):-len(".jsonl.gz")])
+        for name in os.listdir(day_dir)
+        if name.startswith(prefix) and name.endswith(".jsonl.gz") and name[len(prefix):-len(".jsonl.gz")].isdigit()
+    ]
+    number = max(numbers, default=0)
+    path = os.path.join(day_dir, f"{prefix}{number:04d}.jsonl.gz")
+    if os.path.exists(path) and os.path.getsize(path) >= config["segment_max_mb"] * 1024 * 1024:
+        path = os.path.join(day_dir, f"{prefix}{number + 1:04d}.jsonl.gz")
+    return open(path, "ab")
+
+
+def _prune_empty_dirs(path):
+    """Removes now-empty log_type/task/project/user directories above a compacted file."""
+    current = os.path.dirname(path)
+    for _ in range(4):
+        try:
+            os.rmdir(current)
+        except OSError:
+            return
+        current = os.path.dirname(current)
+
+
+def _claim(candidate):
+    # Renaming first means a late append recreates the original path instead of being lost
+    if candidate["claimed"]:
+        return candidate["path"]
+    claimed_path = candidate["path"] + CLAIM_SUFFIX
+    try:
+        os.rename(candidate["path"], claimed_path)
+    except OSError:
+        return None
+    return claimed_path
+
+
+def _content_hash(raw):
+    from hashlib import blake2b
+
+    return blake2b(raw, digest_size=16).hexdigest()
+
+
+def _compact_group(date, log_type, candidates, config, stats):
+    indexed = None
+    segment = _open_segment(date, log_type, config)
+    try:
+        with open(_index_path(date), "a", encoding="utf-8") as index:
+            for candidate in candidates:
+                if segment.tell() >= config["segment_max_mb"] * 1024 * 1024:
+                    segment.close()
+                    segment = _open_segment(date, log_type, config)
+
+                claimed_path = _claim(candidate)
+                if claimed_path is None:
+                    continue
+
+                with open(claimed_path, "rb") as f:
+                    raw = f.read()
+                if raw and not raw.endswith(b"\n"):
+                    raw += b"\n"
+                content_hash = _content_hash(raw)
+
+                # A leftover claim may already be indexed if a previous run died before deleting it.
+                # The task key alone is not enough: a late append can recreate the file after an
+                # earlier compaction, so only a claim with the same content counts as done.
+                if candidate["claimed"]:
+                    if indexed is None:
+                        indexed = {(_index_key(row), row.get("sha")) for row in load_segment_index(date)}
+                    if (_index_key(candidate), content_hash) in indexed:
+                        os.remove(claimed_path)
+                        _prune_empty_dirs(claimed_path)
+                        continue
+
+                member = gzip.compress(raw)
+                offset = segment.tell()
+                segment.write(member)
+                segment.flush()
+                os.fsync(segment.fileno())
+
+                index.write(json.dumps({
+                    "user_id": candidate["user_id"],
+                    "project_id": candidate["project_id"],
+                    "task_id": candidate["task_id"],
+                    "log_type": log_type,
+                    "segment": os.path.basename(segment.name),
+                    "offset": offset,
+                    "length": len(member),
+                    "lines": raw.count(b"\n"),
+                    "raw_bytes": len(raw),
+                    "sha": content_hash
+                }) + "\n")
+                index.flush()
+                os.fsync(index.fileno())
+
+                os.remove(claimed_path)
+                _prune_empty_dirs(claimed_path)
+                stats["files"] += 1
+                stats["raw_bytes"] += len(raw)
+                stats["compressed_bytes"] += len(member)
+    finally:
+        segment.close()
+
+
+def compact_logs():
+    """Merges closed small per-task files into day-partitioned gzip segments.
+
+    Each source file becomes one gzip member appended to a segment, so the index
+    can point straight at it. Runs are incremental (max_files_per_run) and only
+    touch files from previous UTC days, which the writer no longer appends to.
+    """
+    config = _compaction_config()
+    stats = {"files": 0, "raw_bytes": 0, "compressed_bytes": 0}
+
+    os.makedirs(SEGMENTS_DIR, exist_ok=True)
+    with open(os.path.join(SEGMENTS_DIR, ".compact.lock"), "w") as lock:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                print("[Compactor] Another compaction is running. Skipping.")
+                return stats
+
+        groups = defaultdict(list)
+        for i, candidate in enumerate(find_compaction_candidates(config)):
+            if i >= config["max_files_per_run"]:
+                break
+            groups[(candidate["date"], candidate["log_type"])].append(candidate)
+
+        for (date, log_type), candidates in sorted(groups.items()):
+            try:
+                _compact_group(date, log_type, candidates, config, stats)
+            except OSError as e:
+                print(f"[Compactor] Failed to compact {log_type} logs for {date}: {e}")
+
+    print(f"[Compactor] Compacted {stats['files']} files "
+          f"({stats['raw_bytes'] / 1024:.1f} KB -> {stats['compressed_bytes'] / 1024:.1f} KB)")
+    return stats
+
+
+def read_compacted(user_id, project_id, task_id, log_type, date):
+    """Yields the log entries of one task/log type/day from the compacted segments."""
+    day_dir = os.path.join(SEGMENTS_DIR, date)
+    for row in load_segment_index(date):
+        if (row.get("user_id"), row.get("project_id"), row.get("task_id"), row.get("log_type")) != \
+                (str(user_id), str(project_id), str(task_id), log_type):
+            continue
+        with open(os.path.join(day_dir, row["segment"]), "rb") as f:
+            f.seek(row["offset"])
+            raw = gzip.decompress(f.read(row["length"]))
+        for line in raw.decode("utf-8").splitlines():
+            try:
+                yield resolve_event(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+
+
+if __name__ == "__main__":
+    compact_logs()
@@ -1,13 +1,12 @@
 import importlib
 import os
 from datetime import datetime
-from pathlib import Path
-from zoneinfo import ZoneInfo
-
-import yaml
 
 
 def _load_config():
+    import yaml
+    from pathlib import Path
+
     anchor = "dynamics/config.yaml"
     current = Path(__file__).resolve().parent
     for parent in [current] + list(current.parents):
@@ -59,6 +58,94 @@ BLACKBOX_SETTINGS = {
         "delete_after_days": 90,
         "max_disk_usage_gb": 300,
         "cleanup_target_gb": 250
+    },
+    # Demote functions whose self time is below min_cost_ratio x wrapper bookkeeping (log writes excluded)
+    "adaptive_wrapping": {
+        "enabled": False,
+        "warmup_calls": 200,
+        "min_cost_ratio": 1.0,
+        "counter_calls": 1000
+    },
+    # Buffer events in memory per session/task and only write them out when something goes wrong
+    "flight_recorder": {
+        "enabled": False,
+        "capacity": 512,
+        "max_buffers": 256,
+        "key": "session",
+        "flush_on_error": True,
+        "slow_call_sec": 1.0,
+        "flush_signal": "SIGUSR1",
+        "flush_on_shutdown": True
+    },
+    # Identical errors (same frame fingerprint) within the window collapse into one record
+    "error_capture": {
+        "dedup_window_sec": 60,
+        "max_fingerprints": 2048
+    },
+    # On ENOSPC/EIO or sustained slow writes: "spill" to memory, keep "errors_only", or "drop"
+    "writer_degradation": {
+        "mode": "spill",
+        "slow_write_sec": 0.5,
+        "slow_writes_to_degrade": 3,
+        "spill_max_events": 10000,
+        "probe_interval_sec": 5,
+        "fallback_max_mb": 50,
+        "fallback_max_chars": 2000
+    },
+    # Closed per-task day files under small_file_kb are merged into segments/<date>/
+    "compaction": {
+        "small_file_kb": 256,
+        "min_idle_sec": 3600,
+        "segment_max_mb": 64,
+        "max_files_per_run": 5000
+    },
+    # "wrap" replaces functions with blackbox_wrap closures; "monitoring" uses sys.monitoring
+    # callbacks on Python 3.12+ (falls back to "wrap" on older versions or for generators/coroutines)
+    "instrumentation_backend": "wrap",
+    "monitoring": {
+        "tool_id": 4,
+        "log_type": "internal"
+    },
+    # Runtime on/off per module/class/function prefix: {"disabled": ["app.svc", "app.svc.Calc.mul"]}
+    # in control_file (default .blackbox/internal/control.json), polled by mtime and reloaded on reload_signal
+    "runtime_control": {
+        "control_file": None,
+        "poll_interval_sec": 0.5,
+        "reload_signal": "SIGUSR2"
+    },
+    # Doc/module/file/line are written once per function to internal/metadata_dictionary.jsonl;
+    # events carry payload["__fid__"] and an "fn:<id>" tag instead (readers expand them with resolve_event)
+    "metadata_dictionary": {
+        "enabled": True
+    },
+    # "tree": user_<id>/project_<id>/task_<id>/<log_type>/<date>.jsonl
+    # "sharded": shards/<log_type>/<date>/shard-NN.jsonl keyed on user/project, with a per-shard byte-range index
+    "log_layout": "tree",
+    "sharding": {
+        "shard_count": 16,
+        "max_open_files": 64,
+        "index_flush_records": 1024,
+        "index_flush_sec": 5.0
+    },
+    # Empty = local JSONL files only. e.g. [{"type": "jsonl"}, {"type": "otlp_http", "endpoint": "..."}]
+    "sinks": [],
+    # Tag trainer sketches; payload keys with more than max_distinct_values values are never suggested
+    "tag_trainer": {
+        "top_k": 64,
+        "cms_width": 65536,
+        "cms_depth": 4,
+        "hll_precision": 10,
+        "max_distinct_values": 100,
+        "max_fields": 512,
+        "max_missing_groups": 1000,
+        "examples_per_group": 10
+    },
+    # Fungus' own counters/histograms: a periodic "[Fungus] Self metrics" record and an optional
+    # Prometheus text endpoint on 127.0.0.1:http_port/metrics and/or a Unix socket
+    "self_metrics": {
+        "interval_sec": 60,
+        "http_port": None,
+        "unix_socket": None
     }
 }
 
@@ -74,11 +161,14 @@ LOG_PATHS = {
 }
 
 
-# === ENSURE ALL LOG FOLDERS EXIST ===
-for path in LOG_PATHS.values():
-    os.makedirs(path, exist_ok=True)
+# === LOG FOLDERS ARE CREATED ON FIRST WRITE, NOT AT IMPORT ===
+def ensure_log_dirs():
+    for path in LOG_PATHS.values():
+        os.makedirs(path, exist_ok=True)
 
 
 # === COMPATIBILITY: Fallback for legacy log writer ===
 def current_utc_day_logfile():
+    from zoneinfo import ZoneInfo
+
     today_utc = datetime.now(ZoneInfo("UTC"))
@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import threading
+
+from fungus.blackbox_config import BLACKBOX_SETTINGS, LOG_PATHS
+from fungus.blackbox_adaptive import function_key
+from fungus.blackbox_infect import KEY_ATTR, disabled_keys, set_disabled_keys, wrapped_keys
+
+
+# === Runtime Control ===
+# Switch instrumentation off and on per module, class or function while the process runs.
+# A rule is a dotted prefix: "app.svc" matches every function in that module,
+# "app.svc.Calc" a class, "app.svc.Calc.mul" a single method.
+#
+# Disabling swaps the wrapper's key into blackbox_infect's disabled set (one atomic reference
+# swap, seen by every thread on its next call, so references captured with "from x import f"
+# bypass logging too) and then puts the original function back on its module or class.
+# Enabling does the reverse. sys.monitoring code objects are switched with set_monitoring_enabled.
+#
+# Rules come in two layers: the API (disable / enable / apply_control) and the control file
+# (watcher, reload signal). Each source only replaces its own layer; a target is off while
+# either layer matches it.
+DEFAULT_RUNTIME_CONTROL = {
+    "control_file": None,
+    "poll_interval_sec": 0.5,
+    "reload_signal": "SIGUSR2"
+}
+
+_control_lock = threading.Lock()
+_api_rules = frozenset()
+_file_rules = frozenset()
+_rules = frozenset()  # applied: _api_rules | _file_rules
+_unwrapped = set()  # wrappers this module took off their owner (adaptive unwraps are left alone)
+_file_state = {"path": None, "mtime": None, "loaded_at": None, "error": None}
+_watcher = None
+
+
+def _control_config():
+    return {**DEFAULT_RUNTIME_CONTROL, **BLACKBOX_SETTINGS.get("runtime_control", {})}
+
+
+def control_file_path():
+    return _control_config()["control_file"] or os.path.join(LOG_PATHS["internal"], "control.json")
+
+
+def _matches(key, rules):
+    for rule in rules:
+        if key == rule or key.startswith(rule + "."):
+            return True
+    return False
+
+
+def _apply(rules):
+    from fungus.blackbox_injector import injected_wrappers, reinstall_wrapper, restore_original
+
+    global _rules
+    off = {key for key in wrapped_keys() if _matches(key, rules)}
+    set_disabled_keys(off)
+
+    wrappers = injected_wrappers()
+
+    for wrapper, (_, _, original) in wrappers:
+        key = getattr(wrapper, KEY_ATTR, None) or function_key(original)
+        if key in off:
+            if wrapper not in _unwrapped and restore_original(wrapper):
+                _unwrapped.add(wrapper)
+        elif wrapper in _unwrapped:
+            reinstall_wrapper(wrapper)
+            _unwrapped.discard(wrapper)
+
+    switched_off = len(off)
+    monitoring = sys.modules.get("fungus.blackbox_monitoring")
+    if monitoring is not None:
+        for info in list(monitoring._monitored.values()):
+            enabled = not _matches(function_key(info.func), rules)
+            monitoring.set_monitoring_enabled(info.func, enabled)
+            switched_off += not enabled
+
+    if rules != _rules:
+        print(f"[BlackboxControl] Disabled prefixes: {sorted(rules) or 'none'} ({switched_off} functions off)")
+    _rules = rules
+
+
+def _set_layers(api=None, file=None):
+    # Needs _control_lock
+    global _api_rules, _file_rules
+    if api is not None:
+        _api_rules = frozenset(api)
+    if file is not None:
+        _file_rules = frozenset(file)
+    _apply(_api_rules | _file_rules)
+
+
+def apply_control(disabled):
+    """Makes `disabled` (dotted prefixes) the complete set of targets switched off through the API.
+
+    Rules from the control file stay in effect.
+    """
+    with _control_lock:
+        _set_layers(api=disabled)
+
+
+def disable(*targets):
+    with _control_lock:
+        _set_layers(api=_api_rules | set(targets))
+
+
+def enable(*targets):
+    """Lifts API rules; a target also disabled by the control file stays off until the file changes."""
+    with _control_lock:
+        _set_layers(api=(rule for rule in _api_rules if rule not in targets))
+
+
+def enable_all():
+    apply_control(())
+
+
+def reapply_control():
+    """Applies the current rules to functions wrapped or monitored since the last change."""
+    with _control_lock:
+        if _rules:
+            _apply(_rules)
+
+
+def is_disabled(func):
+    return _matches(function_key(func), _rules)
+
+
+# === Control File + Signal ===
+def load_control_file(path=None):
+    """Makes {"disabled": [...]} from the control file its layer of rules. A missing file disables nothing."""
+    path = path or control_file_path()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+        disabled = spec.get("disabled", [])
+        if not isinstance(disabled, list) or not all(isinstance(rule, str) for rule in disabled):
+            raise ValueError("'disabled' must be a list of dotted prefixes")
+    except FileNotFoundError:
+        disabled = []
+    except (OSError, ValueError) as e:
+        # Keep the current rules on a half-written or invalid file
+        _file_state.update(path=path, error=str(e))
+        print(f"[BlackboxControl] Ignoring control file {path}: {e}")
+        return False
+    with _control_lock:
+        _set_layers(file=disabled)
+    _file_state.update(path=path, loaded_at=time.time(), error=None)
+    return True
+
+
+def _file_mtime(path):
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+def _watch_loop(path, interval):
+    while True:
+        mtime = _file_mtime(path)
+        if mtime != _file_state["mtime"]:
+            _file_state["mtime"] = mtime
+            try:
+                load_control_file(path)
+            except Exception as e:
+                print(f"[BlackboxControl] Failed to apply control file: {e}")
+        time.sleep(interval)
+
+
+def _on_signal(signum, frame):
+    # Reload from a separate thread: the handler may have interrupted a holder of _control_lock
+    threading.Thread(target=load_control_file, daemon=True).start()
+
+
+def install_runtime_control():
+    """Starts the control-file watcher and the reload signal handler (main thread only), once."""
+    global _watcher
+    if _watcher is not None:
+        return
+    import signal
+
+    config = _control_config()
+    path = control_file_path()
+    _watcher = threading.Thread(
+        target=_watch_loop, args=(path, config["poll_interval_sec"]), name="fungus-control", daemon=True
+    )
+    _watcher.start()
+
+    signal_name = config["reload_signal"]
+    signum = getattr(signal, signal_name, None) if signal_name else None
+    if signum is None:
+        return
+    try:
+        signal.signal(signum, _on_signal)
+    except ValueError:
+        print(f"[BlackboxControl] {signal_name} handler not installed: not on the main thread")
+
+
+def control_status():
+    return {
+        "disabled_prefixes": sorted(_rules),
+        "api_prefixes": sorted(_api_rules),
+        "file_prefixes": sorted(_file_rules),
+        "disabled_functions": sorted(disabled_keys()),
+        "unwrapped": len(_unwrapped),
+        "control_file": dict(_file_state)
+    }
@@ -0,0 +1,141 @@
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fungus.blackbox_config import BLACKBOX_SETTINGS
+
+
+# === Error Capture ===
+DEFAULT_ERROR_CAPTURE = {
+    "dedup_window_sec": 60,
+    "max_fingerprints": 2048
+}
+
+ERROR_ATTR = "__blackbox_error__"
+
+# fingerprint -> [window start, suppressed repeats, sample fields]
+_recent = OrderedDict()
+_lock = threading.Lock()
+_summary_hook_installed = False
+
+
+def _error_config():
+    return {**DEFAULT_ERROR_CAPTURE, **BLACKBOX_SETTINGS.get("error_capture", {})}
+
+
+def frame_signatures(exc):
+    """file:qualname:line for every frame the exception passed through, innermost last."""
+    import traceback
+
+    signatures = []
+    for frame, lineno in traceback.walk_tb(exc.__traceback__):
+        code = frame.f_code
+        signatures.append(f"{code.co_filename}:{getattr(code, 'co_qualname', code.co_name)}:{lineno}")
+    return signatures
+
+
+def error_fingerprint(exc):
+    import hashlib
+
+    exc_type = type(exc)
+    parts = [f"{exc_type.__module__}.{exc_type.__qualname__}"] + frame_signatures(exc)
+    return hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _admit(fingerprint, sample):
+    """Returns (emit, repeats collapsed since the last emitted record)."""
+    global _summary_hook_installed
+    config = _error_config()
+    now = time.monotonic()
+    evicted = []
+
+    with _lock:
+        entry = _recent.get(fingerprint)
+        if entry is not None and now - entry[0] < config["dedup_window_sec"]:
+            entry[1] += 1
+            if not _summary_hook_installed:
+                _summary_hook_installed = True
+                atexit.register(flush_error_summaries)
+            return False, 0
+
+        repeats = entry[1] if entry is not None else 0
+        _recent[fingerprint] = [now, 0, sample]
+        _recent.move_to_end(fingerprint)
+        while len(_recent) > config["max_fingerprints"]:
+            old_fingerprint, old_entry = _recent.popitem(last=False)
+            if old_entry[1]:
+                evicted.append((old_fingerprint, old_entry))
+
+    for old_fingerprint, old_entry in evicted:
+        _record_summary(old_fingerprint, old_entry[1], old_entry[2])
+    return True, repeats
+
+
+def capture_exception(exc):
+    """Builds the error fields for an Error event.
+
+    The traceback is formatted once per exception object; wrappers further up the
+    stack get a reference to the first record instead. Returns None when the error
+    is a repeat inside the dedup window and should not be written at all.
+    """
+    info = getattr(exc, ERROR_ATTR, None)
+    if info is not None:
+        if info["suppressed"]:
+            return None
+        return {
+            "error": info["error"],
+            "error_type": info["error_type"],
+            "fingerprint": info["fingerprint"],
+            "error_ref": info["error_id"]
+        }
+
+    import traceback
+
+    exc_type = type(exc)
+    fingerprint = error_fingerprint(exc)
+    fields = {
+        "error": str(exc),
+        "error_type": f"{exc_type.__module__}.{exc_type.__qualname__}",
+        "fingerprint": fingerprint,
+        "error_id": os.urandom(8).hex()
+    }
+    emit, repeats = _admit(fingerprint, dict(fields))
+
+    try:
+        setattr(exc, ERROR_ATTR, {**fields, "suppressed": not emit})
+    except (AttributeError, TypeError):
+        pass
+
+    if not emit:
+        return None
+    if repeats:
+        fields["repeats_collapsed"] = repeats
+    if BLACKBOX_SETTINGS.get("include_tracebacks", True):
+        fields["traceback"] = "".join(traceback.format_exception(exc_type, exc, exc.__traceback__))
+    return fields
+
+
+def _record_summary(fingerprint, repeats, sample):
+    from fungus.blackbox_agent import record_event
+
+    record_event("internal", tag="[Autolog] Repeated error", content={
+        **sample,
+        "fingerprint": fingerprint,
+        "repeats_collapsed": repeats
+    }, level="error")
+
+
+def flush_error_summaries():
+    """Writes one record per fingerprint whose repeats were collapsed but not yet reported."""
+    with _lock:
+        pending = [(fp, entry[1], entry[2]) for fp, entry in _recent.items() if entry[1]]
+        for fp, _, _ in pending:
+            _recent[fp][1] = 0
+
+    for fingerprint, repeats, sample in pending:
+        try:
+            _record_summary(fingerprint, repeats, sample)
+        except Exception as e:
+            print(f"[ErrorCapture] Failed to record summary for {fingerprint}: {e}")
@@ -0,0 +1,117 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+
+# === Import-Time Guard ===
+# Modules on the telemetry hot path; importing them must stay cheap and side-effect free
+GUARDED_MODULES = [
+    "fungus",
+    "fungus.blackbox_config",
+    "fungus.blackbox_agent",
+    "fungus.blackbox_writer",
+    "fungus.blackbox_tag_engine",
+    "fungus.blackbox_infect"
+]
+
+# Heavy imports that must only be loaded when actually used
+DEFERRED_IMPORTS = ["yaml", "inspect", "tracemalloc", "uuid", "zoneinfo", "hashlib"]
+
+# Standard-library modules the guarded modules legitimately load; a bare interpreter importing
+# these is the baseline, so the budget scales with the machine instead of being a fixed number
+BASELINE_IMPORTS = [
+    "json", "threading", "datetime", "importlib", "contextvars", "collections",
+    "functools", "bisect", "zlib", "weakref", "errno"
+]
+
+# Fungus may add at most this multiple of the baseline on top of it
+DEFAULT_BUDGET_RATIO = 2.0
+
+
+def measure_import_time(modules=None):
+    """Imports the modules in a fresh interpreter under -X importtime, from an empty working directory.
+
+    Returns the cumulative time of each top-level import (ms), the set of every module
+    imported, and whether the import created anything in the working directory.
+    """
+    modules = modules or GUARDED_MODULES
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [package_parent, os.environ.get("PYTHONPATH")]))}
+
+    with tempfile.TemporaryDirectory(prefix="fungus-importtime-") as cwd:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "; ".join(f"import {m}" for m in modules)],
+            cwd=cwd, env=env, capture_output=True, text=True
+        )
+        created = sorted(os.listdir(cwd))
+
+    if result.returncode != 0:
+        raise RuntimeError(f"Import failed:\n{result.stderr}")
+
+    cumulative = {}
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative_us, column = line[len("import time:"):].split("|")
+            cumulative_us = int(cumulative_us)
+        except ValueError:
+            continue
+        name = column.strip()
+        imported.add(name)
+        # Nested imports are indented by two spaces per level; keep the top-level ones
+        if len(column) - len(column.lstrip(" ")) == 1:
+            cumulative.setdefault(name, cumulative_us / 1000)
+
+    return cumulative, imported, created
+
+
+def check_import_time(budget_ms=None, modules=None, runs=3, ratio=DEFAULT_BUDGET_RATIO):
+    """Returns the added import cost (ms), the budget and a list of problems: budget overrun,
+    eagerly loaded heavy modules, import side effects.
+
+    The cost is the best of `runs` fresh interpreters importing the guarded modules, minus the best
+    of `runs` importing only BASELINE_IMPORTS; interpreter startup and the shared dependencies cancel
+    out. Without an absolute budget_ms the budget is `ratio` times the baseline.
+    """
+    full_ms = baseline_ms = float("inf")
+    for _ in range(max(runs, 1)):
+        cumulative, imported, created = measure_import_time(modules)
+        baseline, _, _ = measure_import_time(BASELINE_IMPORTS)
+        full_ms = min(full_ms, sum(cumulative.values()))
+        baseline_ms = min(baseline_ms, sum(baseline.values()))
+
+    fungus_ms = max(full_ms - baseline_ms, 0.0)
+    budget_ms = budget_ms if budget_ms is not None else ratio * baseline_ms
+    problems = []
+    if fungus_ms > budget_ms:
+        problems.append(f"importing fungus added {fungus_ms:.1f} ms (budget {budget_ms:.1f} ms)")
+    for name in DEFERRED_IMPORTS:
+        if name in imported:
+            problems.append(f"'{name}' is imported eagerly")
+    if created:
+        problems.append(f"import created files in the working directory: {created}")
+    return fungus_ms, budget_ms, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Guard against import-time regressions in Fungus.")
+    parser.add_argument("--budget-ms", type=float, help="absolute budget (default: --ratio times the baseline)")
+    parser.add_argument("--ratio", type=float, default=DEFAULT_BUDGET_RATIO,
+                        help="allowed import cost as a multiple of the bare-interpreter baseline")
+    parser.add_argument("--runs", type=int, default=3, help="best of N runs is compared to the budget")
+    args = parser.parse_args()
+
+    fungus_ms, budget_ms, problems = check_import_time(args.budget_ms, runs=args.runs, ratio=args.ratio)
+
+    print(f"[ImportTime] fungus import: +{fungus_ms:.1f} ms over the baseline (budget {budget_ms:.1f} ms)")
+    for problem in problems:
+        print(f"[ImportTime] FAIL: {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
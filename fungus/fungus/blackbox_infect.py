@@ -1,13 +1,33 @@
 import time
-import traceback
-import tracemalloc
 from functools import wraps
 
 from fungus.blackbox_agent import record_event, get_ctx
+from fungus.blackbox_adaptive import WrapState, MODE_FULL, adaptive_enabled, function_key, timed_recorder
+from fungus.blackbox_errors import capture_exception
+from fungus.blackbox_stats import incr, observe
 
 
 EXCLUDE_ATTR = "__blackbox_exclude__"
 WRAPPED_ATTR = "__blackbox_wrapped__"
+KEY_ATTR = "__blackbox_key__"
+
+# Keys (module.qualname) of wrappers switched off at runtime. Replaced as a whole, never mutated,
+# so a control change is a single reference swap that every thread sees on its next call.
+_disabled_keys = frozenset()
+_wrapped_keys = set()
+
+
+def set_disabled_keys(keys):
+    global _disabled_keys
+    _disabled_keys = frozenset(keys)
+
+
+def disabled_keys():
+    return _disabled_keys
+
+
+def wrapped_keys():
+    return set(_wrapped_keys)
 
 
 def blackbox_exclude(func):
@@ -42,57 +62,95 @@ def blackbox_wrap(label=None, log_type="internal", include_return_value=False):
         if module in EXCLUDED_MODULES:
             return func
 
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            name = label or func.__name__
-            ctx = get_ctx()
-            docstring = (func.__doc__ or "").strip()
-            start_time = time.time()
-
-            tracemalloc.start()
-            start_mem, _ = tracemalloc.get_traced_memory()
+        import tracemalloc
 
-            record_event(log_type, ctx, f"[Autolog] Enter: {name}", {
-                "args": safe_preview(args),
-                "kwargs": safe_preview(kwargs),
-                "doc": docstring,
-                "__func__": func
-            })
+        state = WrapState(func) if adaptive_enabled() else None
+        key = function_key(func)
 
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if key in _disabled_keys:
+                return func(*args, **kwargs)
+            if state is not None and state.mode != MODE_FULL:
+                state.tick()
+                return func(*args, **kwargs)
+
+            enter_time = time.perf_counter()
+            frame = state.enter() if state is not None and state.measuring else None
+            emit = record_event if frame is None else timed_recorder(record_event, frame)
+            call_start = call_end = None
             try:
-                result = func(*args, **kwargs)
+                name = label or func.__name__
+                ctx = get_ctx()
+                docstring = (func.__doc__ or "").strip()
+                start_time = time.time()
 
-                elapsed = time.time() - start_time
-                end_mem, peak_mem = tracemalloc.get_traced_memory()
-                tracemalloc.stop()
+                tracemalloc.start()
+                start_mem, _ = tracemalloc.get_traced_memory()
 
-                preview = safe_preview(result) if include_return_value else safe_preview(result)[:300]
-
-                record_event(log_type, ctx, f"[Autolog] Exit: {name}", {
-                    "result_preview": preview,
-                    "elapsed_time_sec": round(elapsed, 4),
-                    "memory_kb": round((end_mem - start_mem) / 1024, 2),
-                    "peak_memory_kb": round(peak_mem / 1024, 2),
+                emit(log_type, ctx, f"[Autolog] Enter: {name}", {
+                    "args": safe_preview(args),
+                    "kwargs": safe_preview(kwargs),
                     "doc": docstring,
                     "__func__": func
                 })
 
-                return result
-
-            except Exception as e:
-                if tracemalloc.is_tracing():
+                try:
+                    call_start = time.perf_counter()
+                    if frame is not None:
+                        frame[1] = call_start
+                    result = func(*args, **kwargs)
+                    call_end = time.perf_counter()
+                    if frame is not None:
+                        frame[2] = call_end
+
+                    elapsed = time.time() - start_time
+                    end_mem, peak_mem = tracemalloc.get_traced_memory()
                     tracemalloc.stop()
 
-                record_event(log_type, ctx, f"[Autolog] Error in {name}", {
-                    "error": str(e),
-                    "traceback": traceback.format_exc(),
-                    "doc": docstring,
-                    "__func__": func
-                }, level="error")
-
-                raise
-
+                    preview = safe_preview(result) if include_return_value else safe_preview(result)[:300]
+
+                    emit(log_type, ctx, f"[Autolog] Exit: {name}", {
+                        "result_preview": preview,
+                        "elapsed_time_sec": round(elapsed, 4),
+                        "memory_kb": round((end_mem - start_mem) / 1024, 2),
+                        "peak_memory_kb": round(peak_mem / 1024, 2),
+                        "doc": docstring,
+                        "__func__": func
+                    })
+
+                    return result
+
+                except Exception as e:
+                    call_end = call_end or time.perf_counter()
+                    if tracemalloc.is_tracing():
+                        tracemalloc.stop()
+
+                    # Formats the traceback once per exception; outer wrappers only reference it
+                    error = capture_exception(e)
+                    if error is not None:
+                        emit(log_type, ctx, f"[Autolog] Error in {name}", {
+                            **error,
+                            "doc": docstring,
+                            "__func__": func
+                        }, level="error")
+
+                    raise
+            finally:
+                if frame is not None:
+                    state.leave(frame, enter_time)
+                if call_start is not None:
+                    now = time.perf_counter()
+                    inner = (call_end or now) - call_start
+                    incr("wrapped_calls_total")
+                    observe("wrapped_function_seconds", inner)
+                    observe("wrap_overhead_seconds", now - enter_time - inner)
+
+        if state is not None:
+            state.wrapper = wrapper
         setattr(wrapper, WRAPPED_ATTR, True)
+        setattr(wrapper, KEY_ATTR, key)
+        _wrapped_keys.add(key)
         return wrapper
 
     return decorator
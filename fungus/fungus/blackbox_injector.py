@@ -1,17 +1,18 @@
 import os
 import sys
-import yaml
-import inspect
 import importlib
 import importlib.util
 from types import ModuleType
-from pathlib import Path
 
 from fungus.blackbox_infect import is_excluded, blackbox_wrap, is_already_wrapped
 from fungus.blackbox_config import BLACKBOX_SETTINGS
+from fungus.blackbox_adaptive import should_skip_wrapping
 
 
 def _load_config():
+    import yaml
+    from pathlib import Path
+
     anchor = "dynamics/config.yaml"
     current = Path(__file__).resolve().parent
     for parent in [current] + list(current.parents):
@@ -51,6 +52,9 @@ def resolve_module(name):
 
 PROJECT_ROOT = os.getcwd()
 
+# wrapper -> (owner, attribute name, original function)
+_injected = {}
+
 
 def find_python_modules(base_dir):
     modules = []
@@ -79,7 +83,57 @@ def import_module_from_path(name, path):
         return None
 
 
+def _register_injection(owner, name, original, wrapper):
+    if wrapper is not original:
+        _injected[wrapper] = (owner, name, original)
+
+
+def restore_original(wrapper):
+    """Puts the original function back on the module or class it was injected into."""
+    entry = _injected.get(wrapper)
+    if not entry:
+        return False
+    owner, name, original = entry
+    current = owner.__dict__.get(name) if isinstance(owner, type) else getattr(owner, name, None)
+    if current is not wrapper:
+        return False
+    setattr(owner, name, original)
+    return True
+
+
+def _instrument(owner, name, func, label):
+    """Attaches Blackbox to func: sys.monitoring callbacks when that backend is selected, else a wrapper."""
+    if BLACKBOX_SETTINGS.get("instrumentation_backend", "wrap") == "monitoring":
+        from fungus.blackbox_monitoring import monitor_function
+
+        if monitor_function(func, label):
+            return "Monitoring"
+    wrapped = blackbox_wrap(label)(func)
+    setattr(owner, name, wrapped)
+    _register_injection(owner, name, func, wrapped)
+    return "Wrapped"
+
+
+def reinstall_wrapper(wrapper):
+    """Puts a wrapper removed by restore_original back, unless something else replaced the original."""
+    entry = _injected.get(wrapper)
+    if not entry:
+        return False
+    owner, name, original = entry
+    current = owner.__dict__.get(name) if isinstance(owner, type) else getattr(owner, name, None)
+    if current is not original:
+        return current is wrapper
+    setattr(owner, name, wrapper)
+    return True
+
+
+def injected_wrappers():
+    return list(_injected.items())
+
+
 def wrap_module_functions(module):
+    import inspect
+
     if getattr(module, "__blackbox_injected__", False):
         print(f"[🛑] Skipping {module.__name__}: already injected.")
         return
@@ -87,10 +141,12 @@ def wrap_module_functions(module):
 
     for name, obj in inspect.getmembers(module):
         if inspect.isfunction(obj) and not is_excluded(obj) and not is_already_wrapped(obj) and not name.startswith("_"):
+            if should_skip_wrapping(obj):
+                print(f"[⏭] Skipped function (adaptive): {module.__name__}.{name}")
+                continue
             try:
-                wrapped = blackbox_wrap(name)(obj)
-                setattr(module, name, wrapped)
-                print(f"[✔] Wrapped function: {module.__name__}.{name}")
+                how = _instrument(module, name, obj, name)
+                print(f"[✔] {how} function: {module.__name__}.{name}")
             except Exception as e:
                 print(f"[❌] Failed to wrap function {module.__name__}.{name}: {e}")
         elif inspect.isclass(obj):
@@ -98,12 +154,16 @@ def wrap_module_functions(module):
 
 
 def wrap_class_methods(module, cls):
+    import inspect
+
     for name, method in inspect.getmembers(cls, predicate=inspect.isfunction):
         if not is_excluded(method) and not is_already_wrapped(method) and not name.startswith("_"):
+            if should_skip_wrapping(method):
+                print(f"[⏭] Skipped method (adaptive): {module.__name__}.{cls.__name__}.{name}")
+                continue
             try:
-                wrapped = blackbox_wrap(name)(method)
-                setattr(cls, name, wrapped)
-                print(f"[✔] Wrapped method: {module.__name__}.{cls.__name__}.{name}")
+                how = _instrument(cls, name, method, name)
+                print(f"[✔] {how} method: {module.__name__}.{cls.__name__}.{name}")
             except Exception as e:
                 print(f"[❌] Failed to wrap method {cls.__name__}.{name}: {e}")
 
@@ -118,6 +178,11 @@ def auto_inject():
         module = import_module_from_path(mod_name, mod_path)
         if isinstance(module, ModuleType):
             wrap_module_functions(module)
+
+    # Runtime control rules set before this injection also apply to the new wrappers
+    control = sys.modules.get("fungus.blackbox_control")
+    if control is not None:
+        control.reapply_control()
     print("[Blackbox] Auto-injection complete.")
 
 
@@ -0,0 +1,295 @@
+import os
+import gzip
+import json
+import heapq
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+from fungus.blackbox_metadata import DICTIONARY_NAME, resolve_event
+
+
+# === Multi-Host Merge ===
+# Streams the .blackbox trees collected from several hosts into one timeline ordered by __ts__.
+# Phase 1 reads every file once and collects the records that pass the filters in one shared
+# buffer; when it reaches buffer_mb it is sorted and spilled as one ascending run, so thousands
+# of small per-task files make a handful of runs instead of one (or more) each.
+# Phase 2 merges the spilled runs and the last, still in-memory buffer with a heap, at most
+# fan_in files at a time, so memory stays bounded regardless of the input size.
+DEFAULT_FAN_IN = 64
+DEFAULT_BUFFER_MB = 64
+
+# Rough per-record cost of the buffered (ts, line) tuple and its strings beyond the line itself
+_RECORD_OVERHEAD = 150
+
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def find_event_files(root):
+    """Yields every JSONL / gzip JSONL file under a host's .blackbox directory (or its parent)."""
+    blackbox_dir = os.path.join(root, ".blackbox")
+    root = blackbox_dir if os.path.isdir(blackbox_dir) else root
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for fname in sorted(filenames):
+            if fname == DICTIONARY_NAME:
+                continue
+            if fname.endswith(".jsonl") or fname.endswith(".jsonl.gz"):
+                yield os.path.join(dirpath, fname)
+
+
+def load_definitions(roots):
+    """Collects the metadata dictionaries of all hosts; function ids are the same on every host."""
+    definitions = {}
+    for root in roots:
+        for dirpath, _, filenames in os.walk(root):
+            if DICTIONARY_NAME not in filenames:
+                continue
+            with _open_text(os.path.join(dirpath, DICTIONARY_NAME)) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(record, dict) and "fid" in record:
+                        definitions.setdefault(record["fid"], record)
+    return definitions
+
+
+def parse_offsets(pairs):
+    """["host-a=1.5", "host-b=-0.25"] -> {"host-a": 1.5, "host-b": -0.25} (seconds added to that host's clock)."""
+    offsets = {}
+    for pair in pairs or []:
+        host, _, seconds = pair.partition("=")
+        if not host or not seconds:
+            raise ValueError(f"Invalid offset '{pair}', expected HOST=SECONDS")
+        offsets[host] = float(seconds)
+    return offsets
+
+
+def parse_hosts(specs):
+    """["dumps/web-1", "db=dumps/db-1"] -> [("web-1", "dumps/web-1"), ("db", "dumps/db-1")]."""
+    hosts = []
+    for spec in specs:
+        name, sep, path = spec.partition("=")
+        if not sep:
+            path = spec
+            name = os.path.basename(os.path.normpath(spec))
+        hosts.append((name, path))
+    return hosts
+
+
+def _shift(ts, seconds):
+    try:
+        return (datetime.fromisoformat(ts) + timedelta(seconds=seconds)).isoformat()
+    except ValueError:
+        return ts
+
+
+class _RunBuffer:
+    """Collects (ts, json line) records from any number of inputs; whenever they exceed max_bytes
+    they are sorted and spilled as one run of "<ts>\t<json>" lines."""
+
+    def __init__(self, tmpdir, runs, max_bytes=DEFAULT_BUFFER_MB * 1024 * 1024):
+        self.tmpdir = tmpdir
+        self.runs = runs
+        self.max_bytes = max_bytes
+        self.buffer = []
+        self.size = 0
+
+    def add(self, ts, line):
+        self.buffer.append((ts, line))
+        self.size += len(line) + _RECORD_OVERHEAD
+        if self.size >= self.max_bytes:
+            self.spill()
+
+    def _sorted(self):
+        # Stable: records with the same timestamp keep their input order
+        self.buffer.sort(key=lambda item: item[0])
+        records, self.buffer, self.size = self.buffer, [], 0
+        return records
+
+    def spill(self):
+        if not self.buffer:
+            return
+        fd, path = tempfile.mkstemp(suffix=".run", dir=self.tmpdir)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for ts, line in self._sorted():
+                f.write(f"{ts}\t{line}\n")
+        self.runs.append(path)
+
+    def remainder(self):
+        """The records never spilled, sorted; merged straight from memory."""
+        return self._sorted()
+
+
+def _read_run(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            ts, _, record = line.rstrip("\n").partition("\t")
+            yield ts, record
+
+
+def _merge_runs(paths, in_memory=()):
+    """Heap-based k-way merge of ascending runs (and an ascending in-memory list); ties keep the run order."""
+    return heapq.merge(*(_read_run(path) for path in paths), iter(in_memory), key=lambda item: item[0])
+
+
+def _reduce_runs(runs, fan_in, tmpdir):
+    """Merges runs in groups of fan_in until at most fan_in remain, bounding open files."""
+    while len(runs) > fan_in:
+        merged = []
+        for i in range(0, len(runs), fan_in):
+            group = runs[i:i + fan_in]
+            if len(group) == 1:
+                merged.append(group[0])
+                continue
+            fd, path = tempfile.mkstemp(suffix=".run", dir=tmpdir)
+            with os.fdopen(fd, "w", encoding="utf-8") as out:
+                for ts, record in _merge_runs(group):
+                    out.write(f"{ts}\t{record}\n")
+            for old in group:
+                os.remove(old)
+            merged.append(path)
+        runs = merged
+    return runs
+
+
+class _Output:
+    """Writes merged records to .jsonl, .jsonl.gz or a SQLite database (.sqlite3 / .db)."""
+
+    def __init__(self, path, batch_size=1000):
+        self.path = path
+        self.sqlite = path.endswith((".sqlite3", ".sqlite", ".db"))
+        self.batch = []
+        self.batch_size = batch_size
+        if self.sqlite:
+            from fungus.blackbox_sqlite import SQLiteSink
+
+            self.sink = SQLiteSink(path)
+        elif path.endswith(".gz"):
+            self.file = gzip.open(path, "wt", encoding="utf-8")
+        else:
+            self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, event, line):
+        if not self.sqlite:
+            self.file.write(line + "\n")
+            return
+        fields = self.sink.extract_fields(event)
+        payload = event.get("payload")
+        if fields.get("func_signature") is None and isinstance(payload, dict) and isinstance(payload.get("__func__"), str):
+            fields["func_signature"] = payload["__func__"]
+        self.batch.append((event.get("subsystem") or "merged", line, fields))
+        if len(self.batch) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self.batch:
+            self.sink.send(self.batch)
+            self.batch = []
+
+    def close(self):
+        if self.sqlite:
+            self._flush()
+            self.sink._shutdown()
+        else:
+            self.file.close()
+
+
+def merge_logs(hosts, output, sessions=None, tasks=None, offsets=None, fan_in=DEFAULT_FAN_IN, resolve=True,
+               buffer_mb=DEFAULT_BUFFER_MB):
+    """Merges the event files of several hosts into one __ts__-ordered output file.
+
+    hosts is a list of (name, path). Records get a "__host__" field; hosts with a clock offset
+    get a shifted "__ts__" and keep the original in "__ts_original__". Returns merge statistics.
+    """
+    sessions = set(sessions or [])
+    tasks = set(tasks or [])
+    offsets = offsets or {}
+    fan_in = max(fan_in, 2)
+    definitions = load_definitions([path for _, path in hosts]) if resolve else None
+    stats = {"files": 0, "records": 0, "matched": 0, "runs": 0}
+
+    tmpdir = tempfile.mkdtemp(prefix="fungus-merge-")
+    try:
+        runs = []
+        buffer = _RunBuffer(tmpdir, runs, int(buffer_mb * 1024 * 1024))
+        for host, root in hosts:
+            offset = offsets.get(host, 0.0)
+            for path in find_event_files(root):
+                stats["files"] += 1
+                try:
+                    with _open_text(path) as f:
+                        for line in f:
+                            try:
+                                event = json.loads(line)
+                            except json.JSONDecodeError:
+                                continue
+                            if not isinstance(event, dict) or not isinstance(event.get("__ts__"), str):
+                                continue
+                            stats["records"] += 1
+                            if sessions and event.get("session_id") not in sessions:
+                                continue
+                            if tasks and event.get("task_id") not in tasks:
+                                continue
+                            event["__host__"] = host
+                            if offset:
+                                event["__ts_original__"] = event["__ts__"]
+                                event["__ts__"] = _shift(event["__ts__"], offset)
+                            buffer.add(event["__ts__"], json.dumps(event, ensure_ascii=False))
+                            stats["matched"] += 1
+                except (OSError, EOFError) as e:
+                    print(f"[BlackboxMerge] Skipping unreadable {path}: {e}")
+
+        in_memory = buffer.remainder()
+        stats["runs"] = len(runs) + bool(in_memory)
+        # The in-memory remainder needs no file handle, so fan_in still bounds the open runs
+        runs = _reduce_runs(runs, fan_in, tmpdir)
+
+        out = _Output(output)
+        try:
+            for _, line in _merge_runs(runs, in_memory):
+                event = json.loads(line)
+                if resolve:
+                    event = resolve_event(event, definitions)
+                    line = json.dumps(event, ensure_ascii=False)
+                out.write(event, line)
+        finally:
+            out.close()
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print(f"[BlackboxMerge] {stats['matched']} of {stats['records']} records from {stats['files']} files "
+          f"({stats['runs']} runs) -> {output}")
+    return stats
+
+
+def add_arguments(parser):
+    parser.add_argument("hosts", nargs="+", help="host directories, optionally NAME=PATH")
+    parser.add_argument("-o", "--output", required=True, help=".jsonl, .jsonl.gz or .sqlite3/.db")
+    parser.add_argument("--session", action="append", help="only this session id (repeatable)")
+    parser.add_argument("--task", action="append", help="only this task id (repeatable)")
+    parser.add_argument("--offset", action="append", help="HOST=SECONDS added to that host's timestamps")
+    parser.add_argument("--fan-in", type=int, default=DEFAULT_FAN_IN, help="max runs merged at once")
+    parser.add_argument("--buffer-mb", type=float, default=DEFAULT_BUFFER_MB,
+                        help="records held in memory before a sorted run is spilled to disk")
+    parser.add_argument("--no-resolve", action="store_true", help="keep metadata dictionary ids as they are")
+
+
+def run(args):
+    merge_logs(
+        parse_hosts(args.hosts),
+        args.output,
+        sessions=args.session,
+        tasks=args.task,
+        offsets=parse_offsets(args.offset),
+        fan_in=args.fan_in,
+        resolve=not args.no_resolve,
+        buffer_mb=args.buffer_mb
+    )
+    return 0
@@ -0,0 +1,184 @@
+import os
+import sys
+import json
+import threading
+import weakref
+from datetime import datetime
+
+from fungus.blackbox_config import BLACKBOX_SETTINGS, LOG_PATHS
+
+
+# === Metadata Dictionary ===
+# Static function metadata (doc, module, file, line) is written once per signature to
+# internal/metadata_dictionary.jsonl. Events carry only "__fid__" in the payload and an
+# "fn:<id>" tag; resolve_event() expands them again for readers. The id hashes the definition
+# as well as the name, so an edited function (doc, line, parameters) gets a new record.
+DEFAULT_METADATA = {
+    "enabled": True
+}
+
+DICTIONARY_NAME = "metadata_dictionary.jsonl"
+DICTIONARY_PATH = os.path.join(LOG_PATHS["internal"], DICTIONARY_NAME)
+
+_lock = threading.Lock()
+_ids = weakref.WeakKeyDictionary()  # function object -> fid, dropped with the function
+_definitions = {}  # fid -> definition record
+_loaded_size = -1  # bytes of the dictionary file already read
+
+
+def metadata_enabled():
+    return {**DEFAULT_METADATA, **BLACKBOX_SETTINGS.get("metadata_dictionary", {})}["enabled"]
+
+
+def _signature(func):
+    module = getattr(func, "__module__", None) or "unknown"
+    name = getattr(func, "__qualname__", None) or getattr(func, "__name__", "unknown")
+    return f"{module}.{name}"
+
+
+def function_id(signature, fingerprint=""):
+    """Deterministic 48-bit id: the same definition gets the same id in every process and run."""
+    from hashlib import blake2b
+
+    return int.from_bytes(blake2b(f"{signature}\0{fingerprint}".encode("utf-8"), digest_size=6).digest(), "big")
+
+
+def _parameters(func):
+    import inspect
+
+    try:
+        return str(inspect.signature(func))
+    except (TypeError, ValueError):
+        return None
+
+
+def _describe(func, signature):
+    code = getattr(func, "__code__", None)
+    file = getattr(code, "co_filename", None)
+    if file:
+        try:
+            file = os.path.relpath(file)
+        except ValueError:
+            pass
+    return {
+        "signature": signature,
+        "name": getattr(func, "__name__", "unknown"),
+        "module": getattr(func, "__module__", None) or "unknown",
+        "file": file or "unknown",
+        "line": getattr(code, "co_firstlineno", None),
+        "parameters": _parameters(func),
+        "doc": (getattr(func, "__doc__", None) or "").strip()
+    }
+
+
+def _fingerprint(record):
+    # Leaves out "file": it is relative to the working directory, which differs between hosts
+    return json.dumps([record["line"], record["parameters"], record["doc"]], ensure_ascii=False)
+
+
+def _load_dictionary():
+    """Reads definitions appended to the dictionary file since the last call (caller holds _lock)."""
+    global _loaded_size
+    try:
+        size = os.path.getsize(DICTIONARY_PATH)
+    except OSError:
+        return
+    if size == _loaded_size:
+        return
+    with open(DICTIONARY_PATH, "r", encoding="utf-8") as f:
+        if 0 < _loaded_size <= size:
+            f.seek(_loaded_size)
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and "fid" in record:
+                _definitions.setdefault(record["fid"], record)
+        _loaded_size = f.tell()
+
+
+def _write_definition(record):
+    os.makedirs(os.path.dirname(DICTIONARY_PATH), exist_ok=True)
+    data = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+    fd = os.open(DICTIONARY_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+def define_function(func):
+    """Returns func's id, writing its definition record the first time this definition is seen."""
+    try:
+        return _ids[func]
+    except (KeyError, TypeError):
+        pass
+
+    signature = _signature(func)
+    record = _describe(func, signature)
+    fid = function_id(signature, _fingerprint(record))
+    with _lock:
+        if fid not in _definitions:
+            _load_dictionary()
+        if fid not in _definitions:
+            record = {"fid": fid, **record, "defined_at": datetime.utcnow().isoformat()}
+            try:
+                _write_definition(record)
+            except OSError as e:
+                print(f"[BlackboxMetadata] Failed to write definition for {signature}: {e}", file=sys.stderr)
+            _definitions[fid] = record
+    try:
+        _ids[func] = fid
+    except TypeError:
+        pass
+    return fid
+
+
+def lookup(fid):
+    """Definition record for an id, reading newer dictionary entries (other processes) if needed."""
+    record = _definitions.get(fid)
+    if record is None:
+        with _lock:
+            _load_dictionary()
+            record = _definitions.get(fid)
+    return record
+
+
+# === Readers ===
+def resolve_event(event, definitions=None):
+    """Expands "__fid__" / "fn:<id>" in an event back into doc, __func__ and func/module/file tags.
+
+    definitions (fid -> record) replaces the local dictionary, e.g. when merging other hosts' logs.
+    """
+    if not isinstance(event, dict):
+        return event
+    payload = event.get("payload")
+    fid = payload.get("__fid__") if isinstance(payload, dict) else None
+    tags = event.get("tags")
+    if fid is None and isinstance(tags, list):
+        fid = next((int(tag[3:]) for tag in tags if tag.startswith("fn:") and tag[3:].isdigit()), None)
+    if fid is None:
+        return event
+
+    record = definitions.get(fid) if definitions is not None else lookup(fid)
+    if record is None:
+        return event
+    if isinstance(payload, dict) and "__fid__" in payload:
+        payload = {**payload, "doc": record["doc"], "__func__": record["signature"]}
+        payload.pop("__fid__")
+        event = {**event, "payload": payload}
+    if isinstance(tags, list):
+        expanded = []
+        for tag in tags:
+            if tag == f"fn:{fid}":
+                expanded += [f"func:{record['name']}", f"module:{record['module']}", f"file:{record['file']}"]
+            else:
+                expanded.append(tag)
+        event = {**event, "tags": expanded}
+    return event
+
+
+def signature_for(fid):
+    record = lookup(fid)
+    return record["signature"] if record else None
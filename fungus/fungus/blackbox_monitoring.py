@@ -0,0 +1,286 @@
+import sys
+import time
+import threading
+
+from fungus.blackbox_agent import record_event, get_ctx
+from fungus.blackbox_config import BLACKBOX_SETTINGS
+from fungus.blackbox_errors import capture_exception
+from fungus.blackbox_infect import safe_preview
+from fungus.blackbox_stats import incr
+
+
+# === sys.monitoring Backend (PEP 669) ===
+# Instead of replacing functions with wrappers, auto_inject can register PY_START / PY_RETURN
+# callbacks on the selected code objects. Functions keep their identity and frame count, and a
+# disabled code object costs nothing: its callbacks return DISABLE once and are never called again.
+# Exception exits come from PY_UNWIND, which (like RAISE) can only be enabled globally, so its
+# callback ignores code objects that are not registered. It is only switched on while at least
+# one monitored function is enabled; then every unwinding frame in the process pays one callback.
+DEFAULT_MONITORING = {
+    "tool_id": 4,
+    "log_type": "internal"
+}
+
+# Generators and coroutines start and return many times per logical call; they keep the wrapper
+_RESUMABLE_FLAGS = 0x20 | 0x80 | 0x200  # CO_GENERATOR | CO_COROUTINE | CO_ASYNC_GENERATOR
+
+_monitored = {}  # code object -> MonitoredCode
+_lock = threading.Lock()
+_local = threading.local()
+_tool_id = None
+_unavailable_reason = None
+_enabled_count = 0
+_unwind_on = False
+
+
+class MonitoredCode:
+    __slots__ = ("func", "label", "log_type", "enabled", "arg_names", "doc")
+
+    def __init__(self, func, label, log_type):
+        code = func.__code__
+        self.func = func
+        self.label = label or func.__name__
+        self.log_type = log_type
+        self.enabled = False
+        # Positional, keyword-only, *args and **kwargs names, in frame order
+        count = code.co_argcount + code.co_kwonlyargcount + bool(code.co_flags & 0x04) + bool(code.co_flags & 0x08)
+        self.arg_names = code.co_varnames[:count]
+        self.doc = (func.__doc__ or "").strip()
+
+
+def _monitoring_config():
+    return {**DEFAULT_MONITORING, **BLACKBOX_SETTINGS.get("monitoring", {})}
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _on_start(code, instruction_offset):
+    info = _monitored.get(code)
+    if info is None or not info.enabled:
+        return sys.monitoring.DISABLE
+    if getattr(_local, "busy", False):
+        return None
+
+    _local.busy = True
+    try:
+        frame_locals = sys._getframe(1).f_locals
+        args = {name: frame_locals.get(name) for name in info.arg_names}
+        ctx = get_ctx()
+        _stack().append((code, ctx, time.time()))
+        record_event(info.log_type, ctx, f"[Autolog] Enter: {info.label}", {
+            "args": safe_preview(args),
+            "doc": info.doc,
+            "__func__": info.func
+        })
+        incr("monitored_calls_total")
+    finally:
+        _local.busy = False
+
+
+def _pop(code):
+    stack = _stack()
+    for i in range(len(stack) - 1, -1, -1):
+        if stack[i][0] is code:
+            entry = stack[i]
+            del stack[i:]
+            return entry
+    return None
+
+
+def _on_return(code, instruction_offset, retval):
+    info = _monitored.get(code)
+    if info is None or not info.enabled:
+        _pop(code)
+        return sys.monitoring.DISABLE
+    if getattr(_local, "busy", False):
+        return None
+
+    entry = _pop(code)
+    if entry is None:
+        return None
+    _local.busy = True
+    try:
+        _, ctx, start_time = entry
+        record_event(info.log_type, ctx, f"[Autolog] Exit: {info.label}", {
+            "result_preview": safe_preview(retval),
+            "elapsed_time_sec": round(time.time() - start_time, 4),
+            "doc": info.doc,
+            "__func__": info.func
+        })
+    finally:
+        _local.busy = False
+
+
+def _on_unwind(code, instruction_offset, exception):
+    info = _monitored.get(code)
+    if info is None or getattr(_local, "busy", False):
+        return
+    entry = _pop(code)
+    if entry is None or not info.enabled:
+        return
+
+    _local.busy = True
+    try:
+        error = capture_exception(exception)
+        if error is not None:
+            record_event(info.log_type, entry[1], f"[Autolog] Error in {info.label}", {
+                **error,
+                "doc": info.doc,
+                "__func__": info.func
+            }, level="error")
+    finally:
+        _local.busy = False
+
+
+def _ensure_tool():
+    """Claims the sys.monitoring tool id and registers the callbacks once."""
+    global _tool_id, _unavailable_reason
+    if _tool_id is not None:
+        return True
+    if _unavailable_reason is not None:
+        return False
+    if not hasattr(sys, "monitoring"):
+        _unavailable_reason = f"sys.monitoring needs Python 3.12+, running {sys.version.split()[0]}"
+    else:
+        tool_id = _monitoring_config()["tool_id"]
+        try:
+            sys.monitoring.use_tool_id(tool_id, "fungus")
+        except ValueError as e:
+            _unavailable_reason = f"sys.monitoring tool id {tool_id} unavailable: {e}"
+    if _unavailable_reason is not None:
+        print(f"[BlackboxMonitoring] {_unavailable_reason}; falling back to wrapping.")
+        return False
+
+    events = sys.monitoring.events
+    sys.monitoring.register_callback(tool_id, events.PY_START, _on_start)
+    sys.monitoring.register_callback(tool_id, events.PY_RETURN, _on_return)
+    sys.monitoring.register_callback(tool_id, events.PY_UNWIND, _on_unwind)
+    _tool_id = tool_id
+    return True
+
+
+def _set_enabled(info, enabled):
+    """Flips one entry and keeps the global PY_UNWIND event on only while something is enabled. Needs _lock."""
+    global _enabled_count, _unwind_on
+    if info.enabled != enabled:
+        info.enabled = enabled
+        _enabled_count += 1 if enabled else -1
+    wanted = _enabled_count > 0
+    if wanted != _unwind_on:
+        sys.monitoring.set_events(_tool_id, sys.monitoring.events.PY_UNWIND if wanted else 0)
+        _unwind_on = wanted
+
+
+def _arm(code):
+    events = sys.monitoring.events
+    # Re-setting the local events also re-arms locations that returned DISABLE earlier
+    sys.monitoring.set_local_events(_tool_id, code, 0)
+    sys.monitoring.set_local_events(_tool_id, code, events.PY_START | events.PY_RETURN)
+
+
+def can_monitor(func):
+    code = getattr(func, "__code__", None)
+    return code is not None and not code.co_flags & _RESUMABLE_FLAGS
+
+
+def monitor_function(func, label=None, log_type=None):
+    """Registers sys.monitoring callbacks for func's code object. Returns False if the caller should wrap instead."""
+    if not can_monitor(func):
+        return False
+    with _lock:
+        if not _ensure_tool():
+            return False
+        code = func.__code__
+        if code not in _monitored:
+            _monitored[code] = MonitoredCode(func, label, log_type or _monitoring_config()["log_type"])
+        _set_enabled(_monitored[code], True)
+        _arm(code)
+    return True
+
+
+def _code_of(target):
+    return target if hasattr(target, "co_code") else getattr(target, "__code__", None)
+
+
+def set_monitoring_enabled(target, enabled):
+    """Switches one monitored function (or code object) on or off at runtime."""
+    code = _code_of(target)
+    info = _monitored.get(code)
+    if info is None:
+        return False
+    with _lock:
+        _set_enabled(info, enabled)
+        # Disabling needs no local change: the next callback returns DISABLE
+        if enabled:
+            _arm(code)
+    return True
+
+
+def unmonitor_function(target):
+    code = _code_of(target)
+    with _lock:
+        info = _monitored.pop(code, None)
+        if info is None:
+            return False
+        sys.monitoring.set_local_events(_tool_id, code, 0)
+        _set_enabled(info, False)
+    return True
+
+
+def monitoring_status():
+    return {
+        "active": _tool_id is not None,
+        "reason": _unavailable_reason,
+        "tool_id": _tool_id,
+        "monitored": len(_monitored),
+        "enabled": _enabled_count,
+        "unwind_events": _unwind_on
+    }
+
+
+# === Benchmark ===
+def _raise_and_catch(depth):
+    if depth:
+        return _raise_and_catch(depth - 1)
+    raise ValueError("benchmark")
+
+
+def benchmark_unwind_overhead(iterations=100000, depth=3):
+    """Times exception-heavy code that is NOT monitored: with no monitored function, while one is
+    enabled (global PY_UNWIND on), and after it is disabled again."""
+    def probe():
+        pass
+
+    def run():
+        started = time.perf_counter()
+        for _ in range(iterations):
+            try:
+                _raise_and_catch(depth)
+            except ValueError:
+                pass
+        return (time.perf_counter() - started) / iterations * 1e9
+
+    results = {"idle_ns": round(run())}
+    if not monitor_function(probe, "benchmark"):
+        print(f"[BlackboxMonitoring] Benchmark needs sys.monitoring: {_unavailable_reason}")
+        return results
+    try:
+        results["enabled_ns"] = round(run())
+        set_monitoring_enabled(probe, False)
+        results["disabled_ns"] = round(run())
+    finally:
+        unmonitor_function(probe)
+
+    print(f"[BlackboxMonitoring] raise/catch through {depth + 1} frames: {results['idle_ns']} ns idle, "
+          f"{results['enabled_ns']} ns with a monitored function enabled, "
+          f"{results['disabled_ns']} ns after disabling it")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_unwind_overhead()
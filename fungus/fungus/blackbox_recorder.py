@@ -0,0 +1,201 @@
+import atexit
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from fungus.blackbox_config import BLACKBOX_SETTINGS
+
+
+# === Flight Recorder ===
+DEFAULT_FLIGHT_RECORDER = {
+    "enabled": False,
+    "capacity": 512,
+    "max_buffers": 256,
+    "key": "session",
+    "flush_on_error": True,
+    "slow_call_sec": 1.0,
+    "flush_signal": "SIGUSR1",
+    "flush_on_shutdown": True
+}
+
+_buffers = OrderedDict()
+_lock = threading.Lock()
+_hooks_installed = False  # flush signal handler in place (or no signal configured)
+_shutdown_registered = False
+_counters = {"captured": 0, "flushed": 0, "overwritten": 0, "evicted": 0, "flushes": 0}
+
+
+class _RingBuffer:
+    """Preallocated fixed-size buffer; the oldest event is overwritten once full."""
+
+    __slots__ = ("slots", "capacity", "next", "size")
+
+    def __init__(self, capacity):
+        self.slots = [None] * capacity
+        self.capacity = capacity
+        self.next = 0
+        self.size = 0
+
+    def append(self, item):
+        overwrote = self.size == self.capacity
+        self.slots[self.next] = item
+        self.next = (self.next + 1) % self.capacity
+        if not overwrote:
+            self.size += 1
+        return overwrote
+
+    def drain(self):
+        start = (self.next - self.size) % self.capacity
+        items = [self.slots[(start + i) % self.capacity] for i in range(self.size)]
+        self.slots = [None] * self.capacity
+        self.next = 0
+        self.size = 0
+        return items
+
+
+def _recorder_config():
+    return {**DEFAULT_FLIGHT_RECORDER, **BLACKBOX_SETTINGS.get("flight_recorder", {})}
+
+
+def recorder_enabled():
+    return bool(BLACKBOX_SETTINGS.get("flight_recorder", {}).get("enabled"))
+
+
+def _buffer_key(ctx, config):
+    if config["key"] == "task":
+        return ctx.get("task_id") or "unknown"
+    return ctx.get("session_id") or ctx.get("task_id") or "global"
+
+
+def _should_flush(level, content, config):
+    if level == "error" and config["flush_on_error"]:
+        return "error"
+    threshold = config["slow_call_sec"]
+    if threshold is not None and isinstance(content, dict):
+        elapsed = content.get("elapsed_time_sec")
+        if isinstance(elapsed, (int, float)) and elapsed >= threshold:
+            return "slow_call"
+    return None
+
+
+def _snapshot(value):
+    # Callers may reuse and mutate a payload dict after logging it
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+def capture(log_type, ctx, tag, content, level, visibility, log_id, timestamp):
+    """Buffers a compact event in memory; the full event is only built and written on flush.
+
+    ctx and content are shallow-copied so the flush shows them as they were at capture time.
+    """
+    config = _recorder_config()
+    if not _hooks_installed:
+        install_flight_recorder()
+
+    key = _buffer_key(ctx, config)
+    record = (log_type, dict(ctx), tag, _snapshot(content), level, visibility, log_id, timestamp)
+
+    with _lock:
+        buffer = _buffers.get(key)
+        if buffer is None:
+            buffer = _buffers[key] = _RingBuffer(max(int(config["capacity"]), 1))
+            while len(_buffers) > config["max_buffers"]:
+                _, evicted = _buffers.popitem(last=False)
+                _counters["evicted"] += evicted.size
+        else:
+            _buffers.move_to_end(key)
+        if buffer.append(record):
+            _counters["overwritten"] += 1
+        _counters["captured"] += 1
+
+    reason = _should_flush(level, content, config)
+    if reason:
+        flush_flight_recorder(reason, key=key)
+
+
+def flush_flight_recorder(reason="manual", key=None):
+    """Writes buffered events through write_blackbox_log, for one buffer or all of them."""
+    from fungus.blackbox_agent import _build_event, write_blackbox_log
+
+    with _lock:
+        keys = [key] if key is not None else list(_buffers)
+        drained = [(k, _buffers.pop(k).drain()) for k in keys if k in _buffers]
+
+    for buffer_key, records in drained:
+        if not records:
+            continue
+        ctx = records[-1][1]
+        write_blackbox_log("internal", {
+            "__ts__": datetime.utcnow().isoformat(),
+            "tag": "[FlightRecorder] Flush",
+            "reason": reason,
+            "buffer": buffer_key,
+            "events": len(records),
+            "user_id": ctx.get("user_id", "anon"),
+            "project_id": ctx.get("project_id", "unknown"),
+            "task_id": ctx.get("task_id", "unknown"),
+            "session_id": ctx.get("session_id")
+        })
+        for log_type, ctx, tag, content, level, visibility, log_id, timestamp in records:
+            try:
+                event = _build_event(log_type, ctx, tag, content, level, log_id, timestamp)
+                write_blackbox_log(log_type, event, visibility=visibility)
+            except Exception as e:
+                print(f"[FlightRecorder] Failed to flush event {tag}: {e}")
+        with _lock:
+            _counters["flushed"] += len(records)
+            _counters["flushes"] += 1
+
+
+def _on_signal(signum, frame):
+    # Flush from a separate thread: the handler may have interrupted a holder of _lock.
+    threading.Thread(target=flush_flight_recorder, args=("signal",), daemon=True).start()
+
+
+def _on_shutdown():
+    if _recorder_config()["flush_on_shutdown"]:
+        flush_flight_recorder("shutdown")
+
+
+def install_flight_recorder():
+    """Registers the shutdown flush and the flush signal handler.
+
+    Runs as an on_startup hook so the handler is installed from the main thread. Calls from
+    other threads (the lazy install in capture()) only register the shutdown flush and leave
+    the signal handler for a later main-thread call.
+    """
+    global _hooks_installed, _shutdown_registered
+    if _hooks_installed or not recorder_enabled():
+        return
+    import signal
+
+    if not _shutdown_registered:
+        atexit.register(_on_shutdown)
+        _shutdown_registered = True
+
+    signal_name = _recorder_config()["flush_signal"]
+    signum = getattr(signal, signal_name, None) if signal_name else None
+    if signum is None:
+        _hooks_installed = True
+        return
+    if threading.current_thread() is not threading.main_thread():
+        return
+    try:
+        signal.signal(signum, _on_signal)
+    except ValueError as e:
+        print(f"[FlightRecorder] {signal_name} handler not installed: {e}")
+        return
+    _hooks_installed = True
+
+
+def flight_recorder_status():
+    with _lock:
+        return {
+            **_counters,
+            "buffers": len(_buffers),
+            "buffered": sum(b.size for b in _buffers.values())
+        }
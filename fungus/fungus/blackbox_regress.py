@@ -0,0 +1,231 @@
+import json
+import math
+
+from fungus.blackbox_merge import _open_text, find_event_files, load_definitions
+from fungus.blackbox_sketches import QuantileSketch, Reservoir
+
+
+# === Latency Regression Report ===
+# Streams the "[Autolog] Exit" events of two log windows (e.g. before / after a deploy, or two
+# benchmark runs) into a per-signature QuantileSketch (p50/p99) and Reservoir (test sample),
+# then flags signatures whose latency got worse with a one-sided Mann-Whitney U test.
+DEFAULT_REGRESS = {
+    "alpha": 0.01,
+    "min_shift": 0.10,
+    "min_samples": 30,
+    "reservoir_size": 1000,
+    "relative_accuracy": 0.01
+}
+
+EXIT_TAG = "[Autolog] Exit: "
+
+
+class LatencyProfile:
+    """Bounded per-signature latency distributions for one window."""
+
+    def __init__(self, reservoir_size=DEFAULT_REGRESS["reservoir_size"],
+                 relative_accuracy=DEFAULT_REGRESS["relative_accuracy"]):
+        self.reservoir_size = reservoir_size
+        self.relative_accuracy = relative_accuracy
+        self.functions = {}  # signature -> (QuantileSketch, Reservoir)
+
+    def add(self, signature, elapsed):
+        entry = self.functions.get(signature)
+        if entry is None:
+            entry = self.functions[signature] = (
+                QuantileSketch(self.relative_accuracy),
+                Reservoir(self.reservoir_size, seed=len(self.functions))
+            )
+        entry[0].update(elapsed)
+        entry[1].update(elapsed)
+
+    def merge(self, other):
+        for signature, (sketch, sample) in other.functions.items():
+            entry = self.functions.get(signature)
+            if entry is None:
+                self.functions[signature] = (sketch, sample)
+            else:
+                entry[0].merge(sketch)
+                entry[1].merge(sample)
+        return self
+
+
+def _signature(event, definitions):
+    payload = event.get("payload")
+    if isinstance(payload, dict):
+        fid = payload.get("__fid__")
+        if fid is not None:
+            record = definitions.get(fid)
+            return record["signature"] if record else f"fn:{fid}"
+        func = payload.get("__func__")
+        if isinstance(func, str) and not func.startswith("<"):
+            return func
+    return event.get("tag", "")[len(EXIT_TAG):] or "unknown"
+
+
+def collect_latencies(paths, since=None, until=None, profile=None):
+    """Builds a LatencyProfile from the Exit events under paths with since <= __ts__ < until."""
+    profile = profile or LatencyProfile()
+    definitions = load_definitions(paths)
+    for root in paths:
+        for path in find_event_files(root):
+            try:
+                with _open_text(path) as f:
+                    for line in f:
+                        # Cheap pre-filter before parsing: only Exit events carry a latency
+                        if EXIT_TAG not in line:
+                            continue
+                        try:
+                            event = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        if not isinstance(event, dict) or not str(event.get("tag", "")).startswith(EXIT_TAG):
+                            continue
+                        ts = event.get("__ts__") or ""
+                        if (since and ts < since) or (until and ts >= until):
+                            continue
+                        payload = event.get("payload")
+                        elapsed = payload.get("elapsed_time_sec") if isinstance(payload, dict) else None
+                        if isinstance(elapsed, (int, float)) and elapsed >= 0:
+                            profile.add(_signature(event, definitions), float(elapsed))
+            except (OSError, EOFError) as e:
+                print(f"[BlackboxRegress] Skipping unreadable {path}: {e}")
+    return profile
+
+
+def mann_whitney_greater(before, after):
+    """One-sided Mann-Whitney U: p-value for 'after tends to be larger than before' (normal approximation)."""
+    n1, n2 = len(after), len(before)
+    if not n1 or not n2:
+        return 1.0
+    combined = sorted([(v, 1) for v in after] + [(v, 0) for v in before])
+    n = n1 + n2
+    rank_sum = 0.0
+    tie_term = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        ties = j - i + 1
+        average_rank = (i + j) / 2 + 1
+        rank_sum += average_rank * sum(flag for _, flag in combined[i:j + 1])
+        tie_term += ties ** 3 - ties
+        i = j + 1
+
+    u = rank_sum - n1 * (n1 + 1) / 2
+    mean = n1 * n2 / 2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - mean - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def _shift(before, after):
+    """Relative change; None when it is undefined (missing value, or a zero baseline that grew)."""
+    if before is None or after is None:
+        return None
+    if before <= 0:
+        return None if after > 0 else 0.0
+    return after / before - 1
+
+
+def _from_zero(before, after):
+    return before is not None and after is not None and before <= 0 < after
+
+
+def compare_profiles(before, after, alpha=DEFAULT_REGRESS["alpha"], min_shift=DEFAULT_REGRESS["min_shift"],
+                     min_samples=DEFAULT_REGRESS["min_samples"]):
+    """Rows for every signature seen in both windows, regressions first, worst shift first."""
+    rows = []
+    for signature in before.functions.keys() & after.functions.keys():
+        b_sketch, b_sample = before.functions[signature]
+        a_sketch, a_sample = after.functions[signature]
+        row = {
+            "signature": signature,
+            "before_count": b_sketch.count,
+            "after_count": a_sketch.count,
+            "before_p50": b_sketch.quantile(0.5),
+            "after_p50": a_sketch.quantile(0.5),
+            "before_p99": b_sketch.quantile(0.99),
+            "after_p99": a_sketch.quantile(0.99)
+        }
+        row["p50_shift"] = _shift(row["before_p50"], row["after_p50"])
+        row["p99_shift"] = _shift(row["before_p99"], row["after_p99"])
+        enough = b_sketch.count >= min_samples and a_sketch.count >= min_samples
+        row["p_value"] = mann_whitney_greater(b_sample.sample, a_sample.sample) if enough else None
+        # A quantile that was 0 (below the 0.1 ms logging resolution) and is not any more ranks first
+        from_zero = _from_zero(row["before_p50"], row["after_p50"]) or _from_zero(row["before_p99"], row["after_p99"])
+        worst = math.inf if from_zero else max(row["p50_shift"] or 0.0, row["p99_shift"] or 0.0)
+        row["regressed"] = bool(enough and row["p_value"] < alpha and worst >= min_shift)
+        rows.append((not row["regressed"], -worst, signature, row))
+    return [row for *_, row in sorted(rows)]
+
+
+def _fmt_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.2f}"
+
+
+def _fmt_shift(row, quantile):
+    shift = row[f"{quantile}_shift"]
+    if shift is not None:
+        return f"{shift * 100:+.0f}%"
+    return "from 0" if _from_zero(row[f"before_{quantile}"], row[f"after_{quantile}"]) else "-"
+
+
+def format_report(rows, limit=20):
+    lines = [f"{'signature':<50} {'p50 ms':>17} {'p99 ms':>17} {'p50':>6} {'p99':>6} {'p-value':>8}"]
+    for row in rows[:limit]:
+        marker = "!" if row["regressed"] else " "
+        p50 = f"{_fmt_ms(row['before_p50'])}->{_fmt_ms(row['after_p50'])}"
+        p99 = f"{_fmt_ms(row['before_p99'])}->{_fmt_ms(row['after_p99'])}"
+        p_value = "-" if row["p_value"] is None else f"{row['p_value']:.1e}"
+        lines.append(f"{marker}{row['signature'][:49]:<49} {p50:>17} {p99:>17} "
+                     f"{_fmt_shift(row, 'p50'):>6} {_fmt_shift(row, 'p99'):>6} {p_value:>8}")
+    return "\n".join(lines)
+
+
+def detect_regressions(before_paths, after_paths=None, split=None, since=None, until=None,
+                       alpha=DEFAULT_REGRESS["alpha"], min_shift=DEFAULT_REGRESS["min_shift"],
+                       min_samples=DEFAULT_REGRESS["min_samples"]):
+    """Compares two log windows: separate directories, or one set of directories split at a timestamp."""
+    after_paths = after_paths or before_paths
+    if after_paths == before_paths and not split:
+        raise ValueError("Both windows read the same logs: pass after_paths or split")
+    before = collect_latencies(before_paths, since=since, until=split or until)
+    after = collect_latencies(after_paths, since=split or since, until=until)
+    return compare_profiles(before, after, alpha, min_shift, min_samples)
+
+
+def add_arguments(parser):
+    parser.add_argument("--before", nargs="+", required=True, help="baseline log directories")
+    parser.add_argument("--after", nargs="+", help="candidate log directories (default: same as --before, needs --split)")
+    parser.add_argument("--split", help="ISO timestamp: events before it are the baseline, the rest the candidate")
+    parser.add_argument("--since", help="ignore events before this ISO timestamp")
+    parser.add_argument("--until", help="ignore events at or after this ISO timestamp")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_REGRESS["alpha"], help="significance level")
+    parser.add_argument("--min-shift", type=float, default=DEFAULT_REGRESS["min_shift"],
+                        help="relative p50/p99 increase that counts as a regression (0.1 = 10%%)")
+    parser.add_argument("--min-samples", type=int, default=DEFAULT_REGRESS["min_samples"],
+                        help="calls needed in each window before a function is tested")
+    parser.add_argument("--limit", type=int, default=20, help="rows to print")
+    parser.add_argument("--json", dest="json_path", help="also write the full report as JSON")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if any function regressed (CI gate)")
+
+
+def run(args):
+    try:
+        rows = detect_regressions(args.before, args.after, args.split, args.since, args.until,
+                                  args.alpha, args.min_shift, args.min_samples)
+    except ValueError as e:
+        raise SystemExit(f"[BlackboxRegress] {e}")
+    regressed = [row for row in rows if row["regressed"]]
+
+    print(format_report(rows, args.limit))
+    print(f"[BlackboxRegress] {len(regressed)} of {len(rows)} functions regressed "
+          f"(alpha={args.alpha}, min shift={args.min_shift:.0%})")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"regressed": len(regressed), "functions": rows}, f, indent=2, allow_nan=False)
+    return 1 if regressed and args.fail_on_regression else 0
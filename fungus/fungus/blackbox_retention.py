@@ -3,15 +3,18 @@ import json
 import os
 import shutil
 import time
-import yaml
 import importlib
-from datetime import datetime
-from pathlib import Path
+from datetime import datetime, timedelta
 
 from fungus.blackbox_config import LOG_PATHS, BLACKBOX_SETTINGS, BLACKBOX_PATH
+from fungus.blackbox_metadata import DICTIONARY_PATH
+from fungus.blackbox_stats import incr, observe
 
 # === Config Loader ===
 def _load_config():
+    import yaml
+    from pathlib import Path
+
     anchor = "dynamics/config.yaml"
     current = Path(__file__).resolve().parent
     for parent in [current] + list(current.parents):
@@ -51,7 +54,6 @@ def resolve_module(name):
 
 # === Layer 1 Configuration ===
 ARCHIVE_DIR = os.path.join(LOG_PATHS["internal"], "archive")
-os.makedirs(ARCHIVE_DIR, exist_ok=True)
 
 DEFAULT_RETENTION = {
     "max_disk_usage_gb": 300,
@@ -64,8 +66,10 @@ def compress_log_file(path):
     fname = os.path.basename(path)
     compressed_path = os.path.join(ARCHIVE_DIR, fname + ".gz")
     try:
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
         with open(path, "rb") as f_in, gzip.open(compressed_path, "wb") as f_out:
             shutil.copyfileobj(f_in, f_out)
+        incr("retention_archived_bytes_total", os.path.getsize(path))
         os.remove(path)
         return compressed_path
     except Exception as e:
@@ -88,9 +92,18 @@ def get_disk_usage_gb(path):
 def list_log_files_by_age(path):
     """Return list of (path, mtime) tuples sorted by age ascending."""
     files = []
-    for dirpath, _, filenames in os.walk(path):
+    skipped_dirs = {os.path.abspath(os.path.join(BLACKBOX_PATH, name)) for name in ("segments", "shards")}
+    # Every log's "__fid__" ids resolve through the metadata dictionary, so it is never archived
+    dictionary = os.path.abspath(DICTIONARY_PATH)
+    for dirpath, dirnames, filenames in os.walk(path):
+        # Compacted segments and hash shards have byte-offset indexes that must stay valid
+        if os.path.abspath(dirpath) in skipped_dirs:
+            dirnames.clear()
+            continue
         for fname in filenames:
             full_path = os.path.join(dirpath, fname)
+            if os.path.abspath(full_path) == dictionary:
+                continue
             if full_path.endswith(".jsonl") and os.path.isfile(full_path):
                 try:
                     files.append((full_path, os.path.getmtime(full_path)))
@@ -126,11 +139,193 @@ def archive_due_to_disk_pressure(config):
 
     print(f"[RetentionManager] Compressed ~{archived / (1024 ** 3):.2f} GB of logs")
 
+    # Shards and compacted segments are not archived file by file; pack whole old days instead
+    excess = get_disk_usage_gb(BLACKBOX_PATH) - config["cleanup_target_gb"]
+    if excess > 0:
+        freed = archive_partitioned_days(max_bytes=excess * (1024 ** 3))
+        print(f"[RetentionManager] Archived shard/segment days, freeing ~{freed / (1024 ** 3):.2f} GB")
+
+
+# === Day-Partitioned Stores ===
+# shards/<log_type>/<date>/ and segments/<date>/ keep their byte-offset indexes inside the day
+# directory, so a whole day is archived or dropped together with its index entries. Disk
+# pressure packs old days into ARCHIVE_DIR (one tar.gz per day directory, restorable as is);
+# only delete_after_days removes data outright.
+def _is_day(name):
+    try:
+        return len(name) == 10 and bool(datetime.strptime(name, "%Y-%m-%d"))
+    except ValueError:
+        return False
+
+
+def list_partitioned_days():
+    """Return list of (date, day directory, bytes) for shard and segment days, oldest first."""
+    days = []
+    shards_dir = os.path.join(BLACKBOX_PATH, "shards")
+    segments_dir = os.path.join(BLACKBOX_PATH, "segments")
+    parents = [segments_dir]
+    if os.path.isdir(shards_dir):
+        parents += [os.path.join(shards_dir, name) for name in sorted(os.listdir(shards_dir))]
+    for parent in parents:
+        if not os.path.isdir(parent):
+            continue
+        for name in os.listdir(parent):
+            path = os.path.join(parent, name)
+            if _is_day(name) and os.path.isdir(path):
+                days.append((name, path, get_disk_usage_gb(path) * (1024 ** 3)))
+    return sorted(days)
+
+
+def _segments_lock():
+    """Holds the compactor's lock while segment days are removed; None if a compaction is running."""
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+    segments_dir = os.path.join(BLACKBOX_PATH, "segments")
+    if not os.path.isdir(segments_dir):
+        return None
+    lock = open(os.path.join(segments_dir, ".compact.lock"), "w")
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return None
+    return lock
+
+
+def _for_old_days(action, before=None, max_bytes=None):
+    """Runs action(date, path, size) -> bytes freed on shard/segment days older than `before`
+    (a date string), oldest first, until max_bytes are freed. The current UTC day is never touched."""
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    segments_dir = os.path.abspath(os.path.join(BLACKBOX_PATH, "segments"))
+    lock = _segments_lock()
+    freed = 0
+    try:
+        for date, path, size in list_partitioned_days():
+            if date >= today or (before is not None and date >= before):
+                continue
+            if max_bytes is not None and freed >= max_bytes:
+                break
+            if os.path.dirname(os.path.abspath(path)) == segments_dir and lock is None:
+                print(f"[RetentionManager] Compaction running, keeping segments for {date}")
+                continue
+            try:
+                freed += action(date, path, size)
+            except OSError as e:
+                print(f"[RetentionManager] Failed to process {path}: {e}")
+    finally:
+        if lock is not None:
+            lock.close()
+    return freed
+
+
+def _delete_day(date, path, size):
+    shutil.rmtree(path)
+    incr("retention_deleted_bytes_total", size)
+    return size
+
+
+def _day_archive_path(path):
+    # shards/internal/2024-05-01 -> ARCHIVE_DIR/shards_internal_2024-05-01.tar.gz
+    name = os.path.relpath(path, BLACKBOX_PATH).replace(os.sep, "_")
+    candidate = os.path.join(ARCHIVE_DIR, name + ".tar.gz")
+    n = 1
+    while os.path.exists(candidate):
+        candidate = os.path.join(ARCHIVE_DIR, f"{name}.{n}.tar.gz")
+        n += 1
+    return candidate
+
+
+def _archive_day(date, path, size):
+    import tarfile
+
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    archive_path = _day_archive_path(path)
+    partial = archive_path + ".partial"
+    try:
+        with tarfile.open(partial, "w:gz") as tar:
+            tar.add(path, arcname=os.path.relpath(path, BLACKBOX_PATH))
+        os.replace(partial, archive_path)
+    except (OSError, tarfile.TarError) as e:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise OSError(f"archiving failed: {e}")
+    shutil.rmtree(path)
+    incr("retention_archived_bytes_total", size)
+    return max(size - os.path.getsize(archive_path), 0)
+
+
+def archive_partitioned_days(max_bytes=None):
+    """Packs the oldest shard/segment days into ARCHIVE_DIR until max_bytes are freed. Returns the bytes freed."""
+    return _for_old_days(_archive_day, max_bytes=max_bytes)
+
+
+def delete_partitioned_days(before=None, max_bytes=None):
+    """Deletes shard/segment days older than `before` (a date string), or the oldest days until
+    max_bytes are freed. The current UTC day is never touched. Returns the bytes freed."""
+    return _for_old_days(_delete_day, before=before, max_bytes=max_bytes)
+
+
+def delete_expired_archives(before):
+    """Deletes archived shard/segment days (see _day_archive_path) dated before `before`."""
+    freed = 0
+    try:
+        names = os.listdir(ARCHIVE_DIR)
+    except OSError:
+        return freed
+    for name in names:
+        if not name.endswith(".tar.gz"):
+            continue
+        date = name[:-len(".tar.gz")].split(".")[0][-10:]
+        if not _is_day(date) or date >= before:
+            continue
+        path = os.path.join(ARCHIVE_DIR, name)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            freed += size
+            incr("retention_deleted_bytes_total", size)
+        except OSError as e:
+            print(f"[RetentionManager] Failed to delete {path}: {e}")
+    return freed
+
+
+def delete_expired_days(config):
+    """Applies delete_after_days to the sharded layout, the compacted segments and their archived days."""
+    days = config.get("delete_after_days")
+    if not days:
+        return
+    cutoff = (datetime.utcnow() - timedelta(days=days)).strftime("%Y-%m-%d")
+    freed = delete_partitioned_days(before=cutoff) + delete_expired_archives(cutoff)
+    print(f"[RetentionManager] Deleted {freed / (1024 ** 2):.1f} MB of shard/segment days before {cutoff}")
+
+
+def purge_sqlite_logs(config):
+    """Deletes rows older than delete_after_days from every configured SQLite sink."""
+    days = config.get("delete_after_days")
+    if not days:
+        return
+    from fungus.blackbox_sqlite import configured_sqlite_paths, purge_older_than
+
+    for db_path in configured_sqlite_paths():
+        try:
+            deleted = purge_older_than(days, db_path)
+            print(f"[RetentionManager] Purged {deleted} SQLite events older than {days} days from {db_path}")
+        except Exception as e:
+            print(f"[RetentionManager] SQLite purge failed for {db_path}: {e}")
+
 
 def run_retention_policy():
     print("[RetentionManager] Running policy check...")
+    started = time.monotonic()
     config = BLACKBOX_SETTINGS.get("retention_policy", DEFAULT_RETENTION)
     archive_due_to_disk_pressure(config)
+    delete_expired_days(config)
+    purge_sqlite_logs(config)
+    incr("retention_runs_total")
+    observe("retention_seconds", time.monotonic() - started)
     print("[RetentionManager] Complete.")
 
 
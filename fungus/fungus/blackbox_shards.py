@@ -0,0 +1,214 @@
+import os
+import sys
+import json
+import zlib
+import errno
+import time
+import atexit
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from fungus.blackbox_config import BLACKBOX_PATH, BLACKBOX_SETTINGS
+from fungus.blackbox_metadata import resolve_event
+
+
+# === Hash-Sharded Layout ===
+# log_layout "sharded": shards/<log_type>/<date>/shard-NN.jsonl, one file per (user, project) hash bucket.
+# Each shard has a shard-NN.idx next to it. Byte ranges are grouped per tenant in memory and
+# flushed every index_flush_records records / index_flush_sec seconds as one JSON line per tenant,
+# {"u": user_id, "p": project_id, "r": [[byte offset, byte length, record count], ...]},
+# so interleaved tenants do not cost an index line per record.
+DEFAULT_SHARDING = {
+    "shard_count": 16,
+    "max_open_files": 64,
+    "index_flush_records": 1024,
+    "index_flush_sec": 5.0
+}
+
+SHARDS_DIR = os.path.join(BLACKBOX_PATH, "shards")
+
+_shard_lock = threading.Lock()
+_open_shards = OrderedDict()  # data path -> [fd, idx fd, {(user, project): [[start, end, count], ...]}, records, flushed at]
+_known_dirs = set()
+
+
+def _sharding_config():
+    return {**DEFAULT_SHARDING, **BLACKBOX_SETTINGS.get("sharding", {})}
+
+
+def sharded_layout_enabled():
+    return BLACKBOX_SETTINGS.get("log_layout", "tree") == "sharded"
+
+
+def shard_for(user_id, project_id, shard_count=None):
+    shard_count = shard_count or _sharding_config()["shard_count"]
+    return zlib.crc32(f"{user_id}\0{project_id}".encode("utf-8")) % shard_count
+
+
+def shard_path(log_type, date, shard, shards_dir=None):
+    return os.path.join(shards_dir or SHARDS_DIR, log_type, date, f"shard-{shard:02d}.jsonl")
+
+
+def _index_path(path):
+    return path[:-len(".jsonl")] + ".idx"
+
+
+def _flush_runs(entry):
+    pending = entry[2]
+    if not pending:
+        return
+    entry[2] = {}
+    entry[3] = 0
+    entry[4] = time.monotonic()
+    lines = [
+        json.dumps({"u": user_id, "p": project_id, "r": [[start, end - start, count] for start, end, count in ranges]})
+        for (user_id, project_id), ranges in pending.items()
+    ]
+    os.write(entry[1], ("\n".join(lines) + "\n").encode("utf-8"))
+
+
+def _close_entry(entry):
+    try:
+        _flush_runs(entry)
+    finally:
+        os.close(entry[0])
+        os.close(entry[1])
+
+
+def _open_shard(path, max_open):
+    entry = _open_shards.get(path)
+    if entry is not None:
+        _open_shards.move_to_end(path)
+        return entry
+
+    folder = os.path.dirname(path)
+    if folder not in _known_dirs:
+        os.makedirs(folder, exist_ok=True)
+        _known_dirs.add(folder)
+    flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+    fd = os.open(path, flags, 0o644)
+    try:
+        idx_fd = os.open(_index_path(path), flags, 0o644)
+    except OSError:
+        os.close(fd)
+        raise
+    entry = _open_shards[path] = [fd, idx_fd, {}, 0, time.monotonic()]
+
+    while len(_open_shards) > max_open:
+        _, oldest = _open_shards.popitem(last=False)
+        _close_entry(oldest)
+    return entry
+
+
+def append_sharded(log_type, log_data, line, shards_dir=None):
+    """Appends one serialised record to its shard and adds its byte range to the tenant's pending runs.
+
+    Returns the number of bytes written.
+    """
+    config = _sharding_config()
+    user_id = str(log_data.get("user_id", "anon"))
+    project_id = str(log_data.get("project_id", "unknown"))
+    date = datetime.utcnow().strftime("%Y-%m-%d")
+    path = shard_path(log_type, date, shard_for(user_id, project_id, config["shard_count"]), shards_dir)
+    data = line.encode("utf-8")
+
+    with _shard_lock:
+        entry = _open_shard(path, config["max_open_files"])
+        written = os.write(entry[0], data)
+        if written != len(data):
+            raise OSError(errno.ENOSPC, "Short write to shard file", path)
+        # With O_APPEND the descriptor's offset ends up right after our own write,
+        # even when other processes append to the same shard concurrently
+        end = os.lseek(entry[0], 0, os.SEEK_CUR)
+        start = end - written
+
+        ranges = entry[2].setdefault((user_id, project_id), [])
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+            ranges[-1][2] += 1
+        else:
+            ranges.append([start, end, 1])
+        entry[3] += 1
+        if entry[3] >= config["index_flush_records"] or time.monotonic() - entry[4] >= config["index_flush_sec"]:
+            _flush_runs(entry)
+    return written
+
+
+def flush_shard_indexes():
+    """Writes out pending index runs and closes all shard files."""
+    with _shard_lock:
+        while _open_shards:
+            _, entry = _open_shards.popitem(last=False)
+            try:
+                _close_entry(entry)
+            except OSError as e:
+                print(f"[BlackboxShards] Failed to flush shard index: {e}", file=sys.stderr)
+
+
+atexit.register(flush_shard_indexes)
+
+
+# === Reading ===
+def _load_runs(idx_path):
+    """Flattens index lines into {"u", "p", "o", "n"} runs (single-run lines are still accepted)."""
+    runs = []
+    try:
+        with open(idx_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "r" in record:
+                    runs.extend({"u": record["u"], "p": record["p"], "o": o, "n": n} for o, n, _ in record["r"])
+                else:
+                    runs.append(record)
+    except FileNotFoundError:
+        pass
+    return runs
+
+
+def _parse_lines(raw, user_id=None, project_id=None):
+    for line in raw.decode("utf-8", errors="replace").splitlines():
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if user_id is None or (str(entry.get("user_id", "anon")) == user_id
+                               and str(entry.get("project_id", "unknown")) == project_id):
+            yield resolve_event(entry)
+
+
+def read_tenant_logs(user_id, project_id, log_type, date=None):
+    """Yields one tenant's records of a log type and day from the sharded layout.
+
+    Indexed byte ranges are read directly; anything not covered by the index yet
+    (runs still pending in a live process, or lost in a crash) is scanned and filtered.
+    """
+    user_id, project_id = str(user_id), str(project_id)
+    date = date or datetime.utcnow().strftime("%Y-%m-%d")
+    path = shard_path(log_type, date, shard_for(user_id, project_id))
+    if not os.path.exists(path):
+        return
+
+    with _shard_lock:
+        entry = _open_shards.get(path)
+        if entry is not None:
+            _flush_runs(entry)
+
+    runs = sorted(_load_runs(_index_path(path)), key=lambda run: run["o"])
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        position = 0
+        for run in runs:
+            if run["o"] > position:
+                f.seek(position)
+                yield from _parse_lines(f.read(run["o"] - position), user_id, project_id)
+            if run["u"] == user_id and run["p"] == project_id:
+                f.seek(run["o"])
+                yield from _parse_lines(f.read(run["n"]))
+            position = max(position, run["o"] + run["n"])
+        if size > position:
+            f.seek(position)
+            yield from _parse_lines(f.read(size - position), user_id, project_id)
@@ -0,0 +1,438 @@
+import atexit
+import gzip
+import http.client
+import importlib
+import json
+import queue
+import random
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from fungus.blackbox_config import BLACKBOX_SETTINGS
+from fungus.blackbox_writer import write_local_log, _safe_serialize
+
+
+# === Sink Interface ===
+class BlackboxSink:
+    """A destination for events handed to write_blackbox_log."""
+
+    def emit(self, log_type, log_data, visibility="internal"):
+        raise NotImplementedError
+
+    def flush(self, timeout=None):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class JsonlSink(BlackboxSink):
+    """The local per-task JSONL files (the default when no sinks are configured)."""
+
+    def emit(self, log_type, log_data, visibility="internal"):
+        write_local_log(log_type, log_data)
+
+
+class SinkPermanentError(Exception):
+    """Raised by a sink when retrying the same batch cannot succeed (e.g. HTTP 400)."""
+
+
+_STOP = object()
+
+# Fields copied next to the serialised line so exporters can map them without re-parsing
+EVENT_FIELDS = ("__ts__", "level", "tag", "subsystem", "user_id", "project_id", "task_id", "session_id")
+
+
+class BatchingSink(BlackboxSink):
+    """Queues events and ships them from a background thread in batches, with retry and backoff.
+
+    Subclasses implement send(batch), where batch is a list of (log_type, line, fields).
+    """
+
+    def __init__(self, batch_size=500, flush_interval_sec=1.0, queue_max=10000,
+                 max_retries=5, backoff_base_sec=0.2, backoff_max_sec=10.0):
+        self.batch_size = batch_size
+        self.flush_interval_sec = flush_interval_sec
+        self.max_retries = max_retries
+        self.backoff_base_sec = backoff_base_sec
+        self.backoff_max_sec = backoff_max_sec
+        self.counters = {"queued": 0, "sent": 0, "dropped": 0, "retries": 0, "batches": 0}
+        self._counters_lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_max)
+        self._thread = None
+        self._closed = False
+        self._start_lock = threading.Lock()
+
+    def emit(self, log_type, log_data, visibility="internal"):
+        item = (log_type, _safe_serialize(log_data), self.extract_fields(log_data))
+        if self._closed:
+            # Late events during interpreter shutdown: no worker left to drain the queue, and
+            # nothing should sleep through a backoff there, so one attempt and no retries
+            self._send_with_retry([item], max_retries=0)
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(item)
+            self._count("queued")
+        except queue.Full:
+            self._count("dropped")
+
+    def _count(self, name, value=1):
+        # Updated from the flush thread and from emitting threads (queue full, late events)
+        with self._counters_lock:
+            self.counters[name] += value
+
+    def extract_fields(self, log_data):
+        return {k: log_data.get(k) for k in EVENT_FIELDS}
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval_sec
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = None
+
+            if item is not None and item is not _STOP and not isinstance(item, threading.Event):
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+
+            if batch:
+                self._send_with_retry(batch)
+                batch = []
+            deadline = time.monotonic() + self.flush_interval_sec
+
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is _STOP:
+                self._shutdown()
+                return
+
+    def _send_with_retry(self, batch, max_retries=None):
+        max_retries = self.max_retries if max_retries is None else max_retries
+        for attempt in range(max_retries + 1):
+            try:
+                self.send(batch)
+                self._count("sent", len(batch))
+                self._count("batches")
+                return
+            except SinkPermanentError as e:
+                print(f"[Sinks] {type(self).__name__} rejected batch of {len(batch)}: {e}", file=sys.stderr)
+                break
+            except Exception as e:
+                if attempt == max_retries:
+                    print(f"[Sinks] {type(self).__name__} gave up after {attempt + 1} attempts: {e}", file=sys.stderr)
+                    break
+                self._count("retries")
+                delay = min(self.backoff_max_sec, self.backoff_base_sec * (2 ** attempt))
+                time.sleep(delay * random.uniform(0.5, 1.0))
+        self._count("dropped", len(batch))
+
+    def send(self, batch):
+        raise NotImplementedError
+
+    def _shutdown(self):
+        pass
+
+    def flush(self, timeout=5.0):
+        # A closed sink has no worker to answer the flush marker
+        if self._thread is None or self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+
+# === Exporters ===
+class _ConnectionPool:
+    """Keeps idle keep-alive HTTP connections to one collector for reuse."""
+
+    def __init__(self, url, size=2, timeout=5.0):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme or "http"
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or (443 if self.scheme == "https" else 80)
+        self.path = parts.path or "/"
+        self.size = size
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        conn_cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return conn_cls(self.host, self.port, timeout=self.timeout)
+
+    def put(self, conn):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+_SEVERITY_NUMBERS = {"debug": 5, "info": 9, "warning": 13, "warn": 13, "error": 17, "critical": 21}
+
+
+def _time_unix_nano(ts):
+    try:
+        parsed = datetime.fromisoformat(ts)
+    except (TypeError, ValueError):
+        return str(time.time_ns())
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return str(int(parsed.timestamp() * 1_000_000_000))
+
+
+class OTLPHttpSink(BatchingSink):
+    """Exports batches as OTLP/HTTP JSON log records, gzip-compressed, over pooled connections."""
+
+    def __init__(self, endpoint="http://127.0.0.1:4318/v1/logs", headers=None, compress=True,
+                 service_name="fungus", pool_size=2, timeout_sec=5.0, **batch_options):
+        super().__init__(**batch_options)
+        self.pool = _ConnectionPool(endpoint, size=pool_size, timeout=timeout_sec)
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self.compress = compress
+        self.service_name = service_name
+
+    def _log_record(self, log_type, line, fields):
+        level = str(fields.get("level") or "info").lower()
+        attributes = [{"key": "fungus.log_type", "value": {"stringValue": log_type}}]
+        for key in ("tag", "user_id", "project_id", "task_id", "session_id"):
+            if fields.get(key) is not None:
+                attributes.append({"key": f"fungus.{key}", "value": {"stringValue": str(fields[key])}})
+        return {
+            "timeUnixNano": _time_unix_nano(fields.get("__ts__")),
+            "severityText": level.upper(),
+            "severityNumber": _SEVERITY_NUMBERS.get(level, 9),
+            "body": {"stringValue": line},
+            "attributes": attributes
+        }
+
+    def encode(self, batch):
+        payload = {
+            "resourceLogs": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": self.service_name}}
+                ]},
+                "scopeLogs": [{
+                    "scope": {"name": "fungus"},
+                    "logRecords": [self._log_record(*item) for item in batch]
+                }]
+            }]
+        }
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        headers = dict(self.headers)
+        if self.compress:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+        return body, headers
+
+    def send(self, batch):
+        body, headers = self.encode(batch)
+        conn = self.pool.get()
+        try:
+            conn.request("POST", self.pool.path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except Exception:
+            conn.close()
+            raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            self.pool.put(conn)
+
+        if response.status == 429 or response.status >= 500:
+            raise ConnectionError(f"collector returned HTTP {response.status}")
+        if response.status >= 400:
+            raise SinkPermanentError(f"collector returned HTTP {response.status}")
+
+    def _shutdown(self):
+        self.pool.close()
+
+
+class DatagramSink(BatchingSink):
+    """Packs newline-delimited events into UDP or Unix datagrams (udp://host:port, unix:///path)."""
+
+    def __init__(self, address="udp://127.0.0.1:5140", max_datagram_bytes=8192, **batch_options):
+        super().__init__(**batch_options)
+        parts = urlsplit(address)
+        if parts.scheme == "unix":
+            self.family, self.target = socket.AF_UNIX, parts.path
+        elif parts.scheme == "udp":
+            self.family, self.target = socket.AF_INET, (parts.hostname or "127.0.0.1", parts.port or 5140)
+        else:
+            raise ValueError(f"Unsupported datagram address: {address}")
+        self.max_datagram_bytes = max_datagram_bytes
+        self._sock = None
+
+    def _socket(self):
+        if self._sock is None:
+            self._sock = socket.socket(self.family, socket.SOCK_DGRAM)
+        return self._sock
+
+    def send(self, batch):
+        chunk, size = [], 0
+        for _, line, _ in batch:
+            data = line.encode("utf-8")
+            if len(data) >= self.max_datagram_bytes:
+                self._count("dropped")
+                continue
+            if size + len(data) + 1 > self.max_datagram_bytes:
+                self._send_datagram(chunk)
+                chunk, size = [], 0
+            chunk.append(data)
+            size += len(data) + 1
+        if chunk:
+            self._send_datagram(chunk)
+
+    def _send_datagram(self, chunk):
+        try:
+            self._socket().sendto(b"\n".join(chunk) + b"\n", self.target)
+        except OSError:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+            raise
+
+    def _shutdown(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class StdoutSink(BatchingSink):
+    """Writes batches of JSON lines to stdout (or any text stream)."""
+
+    def __init__(self, stream=None, **batch_options):
+        super().__init__(**batch_options)
+        self.stream = stream
+
+    def send(self, batch):
+        stream = self.stream or sys.stdout
+        stream.write("".join(line + "\n" for _, line, _ in batch))
+        stream.flush()
+
+
+# === Sink Registry ===
+SINK_TYPES = {
+    "jsonl": JsonlSink,
+    "otlp_http": OTLPHttpSink,
+    "datagram": DatagramSink,
+    "stdout": StdoutSink
+}
+
+_active_sinks = None
+_sinks_lock = threading.Lock()
+_close_registered = False
+
+
+def register_sink_type(name, sink_cls):
+    SINK_TYPES[name] = sink_cls
+
+
+# Sink types living in their own module, registered on first use
+_LAZY_SINK_MODULES = {
+    "sqlite": "fungus.blackbox_sqlite"
+}
+
+
+def build_sink(spec):
+    if isinstance(spec, BlackboxSink):
+        return spec
+    options = dict(spec)
+    sink_type = options.pop("type", "jsonl")
+    if sink_type not in SINK_TYPES and sink_type in _LAZY_SINK_MODULES:
+        importlib.import_module(_LAZY_SINK_MODULES[sink_type])
+    if sink_type not in SINK_TYPES:
+        raise KeyError(f"Unknown sink type '{sink_type}'. Known: {sorted(SINK_TYPES)}")
+    return SINK_TYPES[sink_type](**options)
+
+
+def _build_sinks(specs):
+    return [build_sink(spec) for spec in specs or [{"type": "jsonl"}]]
+
+
+def configure_sinks(specs=None):
+    """(Re)builds the active sinks from specs, or from BLACKBOX_SETTINGS['sinks'] when omitted."""
+    global _active_sinks
+    sinks = _build_sinks(BLACKBOX_SETTINGS.get("sinks") if specs is None else specs)
+    with _sinks_lock:
+        previous, _active_sinks = _active_sinks, sinks
+        _register_close()
+    for sink in previous or []:
+        sink.close()
+    return sinks
+
+
+def get_sinks():
+    global _active_sinks
+    sinks = _active_sinks
+    if sinks is None:
+        with _sinks_lock:
+            if _active_sinks is None:
+                _active_sinks = _build_sinks(BLACKBOX_SETTINGS.get("sinks"))
+                _register_close()
+            sinks = _active_sinks
+    return sinks
+
+
+def _register_close():
+    # Called under _sinks_lock by both ways of creating sinks, so queued events are drained at exit
+    global _close_registered
+    if not _close_registered:
+        atexit.register(close_sinks)
+        _close_registered = True
+
+
+def dispatch(log_type, log_data, visibility="internal"):
+    for sink in get_sinks():
+        try:
+            sink.emit(log_type, log_data, visibility)
+        except Exception as e:
+            print(f"[Sinks] {type(sink).__name__} failed: {e}", file=sys.stderr)
+
+
+def flush_sinks(timeout=5.0):
+    for sink in _active_sinks or []:
+        sink.flush(timeout)
+
+
+def close_sinks():
+    """Drains and stops every sink; events emitted afterwards get one synchronous attempt, no retries."""
+    for sink in _active_sinks or []:
+        try:
+            sink.close()
+        except Exception as e:
+            print(f"[Sinks] Failed to close {type(sink).__name__}: {e}", file=sys.stderr)
@@ -0,0 +1,206 @@
+import math
+from array import array
+from hashlib import blake2b
+
+
+# === Streaming Sketches ===
+# Fixed-size summaries for the tag trainer and the regression report. All of them merge:
+# CountMinSketch, HyperLogLog and QuantileSketch merges are exact (identical to a single pass
+# over the combined input), MisraGries merges keep the single-pass error bound
+# (count - n/(k+1) <= estimate <= count) and Reservoir merges draw from each side in proportion to its stream length.
+
+def _hash64(item):
+    return int.from_bytes(blake2b(str(item).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class MisraGries:
+    """Top-k heavy hitters with at most k counters."""
+
+    def __init__(self, k=64):
+        self.k = k
+        self.counters = {}
+        self.total = 0
+
+    def update(self, item, count=1):
+        self.total += count
+        counters = self.counters
+        if item in counters:
+            counters[item] += count
+            return
+        if len(counters) < self.k:
+            counters[item] = count
+            return
+        # Decrement every counter (and the newcomer) by the smallest amount that frees a slot
+        dec = min(count, min(counters.values()))
+        for key in list(counters):
+            counters[key] -= dec
+            if counters[key] <= 0:
+                del counters[key]
+        if count > dec:
+            counters[item] = count - dec
+
+    def merge(self, other):
+        for item, count in other.counters.items():
+            self.counters[item] = self.counters.get(item, 0) + count
+        self.total += other.total
+        if len(self.counters) > self.k:
+            cut = sorted(self.counters.values(), reverse=True)[self.k]
+            self.counters = {item: count - cut for item, count in self.counters.items() if count > cut}
+        return self
+
+    def candidates(self):
+        return list(self.counters)
+
+    def most_common(self, n=None):
+        ranked = sorted(self.counters.items(), key=lambda kv: (-kv[1], str(kv[0])))
+        return ranked if n is None else ranked[:n]
+
+
+class CountMinSketch:
+    """Approximate counts: never under-estimates, over-estimates by at most e/width x total w.p. 1 - e^-depth."""
+
+    def __init__(self, width=65536, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = array("Q", bytes(8 * width * depth))
+        self.total = 0
+
+    def _cells(self, item):
+        h = _hash64(item)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def update(self, item, count=1):
+        table = self.table
+        for cell in self._cells(item):
+            table[cell] += count
+        self.total += count
+
+    def estimate(self, item):
+        table = self.table
+        return min(table[cell] for cell in self._cells(item))
+
+    def error_bound(self):
+        return math.e / self.width * self.total
+
+    def merge(self, other):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError("Cannot merge count-min sketches with different dimensions")
+        table = self.table
+        for i, value in enumerate(other.table):
+            if value:
+                table[i] += value
+        self.total += other.total
+        return self
+
+
+class HyperLogLog:
+    """Distinct-count estimate in 2^precision bytes (~1.04 / sqrt(2^precision) relative error)."""
+
+    def __init__(self, precision=10):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def update(self, item):
+        h = _hash64(item)
+        rest_bits = 64 - self.precision
+        index = h >> rest_bits
+        rest = h & ((1 << rest_bits) - 1)
+        rank = rest_bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)
+        return raw
+
+    def merge(self, other):
+        if self.precision != other.precision:
+            raise ValueError("Cannot merge HyperLogLogs with different precision")
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+
+class QuantileSketch:
+    """Log-bucketed quantiles with bounded relative error (DDSketch-style); merges exactly."""
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-9):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def update(self, value):
+        self.count += 1
+        if value <= self.min_value:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def merge(self, other):
+        if self.gamma != other.gamma:
+            raise ValueError("Cannot merge quantile sketches with different accuracy")
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+
+class Reservoir:
+    """Uniform sample of at most k values from a stream (Algorithm R)."""
+
+    def __init__(self, k=1000, seed=0):
+        import random
+
+        self.k = k
+        self.seen = 0
+        self.sample = []
+        self._random = random.Random(seed)
+
+    def update(self, value):
+        self.seen += 1
+        if len(self.sample) < self.k:
+            self.sample.append(value)
+            return
+        j = self._random.randrange(self.seen)
+        if j < self.k:
+            self.sample[j] = value
+
+    def merge(self, other):
+        """Draws each slot from either side in proportion to how many values it has seen."""
+        total = self.seen + other.seen
+        if not total:
+            return self
+        mine, theirs = list(self.sample), list(other.sample)
+        self._random.shuffle(mine)
+        self._random.shuffle(theirs)
+        merged = []
+        while len(merged) < self.k and (mine or theirs):
+            take_mine = mine and (not theirs or self._random.random() < self.seen / total)
+            merged.append(mine.pop() if take_mine else theirs.pop())
+        self.sample = merged
+        self.seen = total
+        return self
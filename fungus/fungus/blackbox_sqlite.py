@@ -0,0 +1,215 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from fungus.blackbox_config import BLACKBOX_PATH, BLACKBOX_SETTINGS
+from fungus.blackbox_metadata import signature_for
+from fungus.blackbox_shards import flush_shard_indexes
+from fungus.blackbox_sinks import BatchingSink, register_sink_type
+from fungus.blackbox_tag_engine import _generate_signature
+from fungus.blackbox_writer import write_local_log, _safe_serialize
+
+
+# === SQLite Sink ===
+DEFAULT_SQLITE_PATH = os.path.join(BLACKBOX_PATH, "blackbox.sqlite3")
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY,
+        ts TEXT NOT NULL,
+        log_type TEXT,
+        subsystem TEXT,
+        level TEXT,
+        tag TEXT,
+        user_id TEXT,
+        project_id TEXT,
+        task_id TEXT,
+        session_id TEXT,
+        func_signature TEXT,
+        elapsed_time_sec REAL,
+        payload TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts)",
+    "CREATE INDEX IF NOT EXISTS idx_events_tenant ON events (user_id, project_id, task_id, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_events_session ON events (session_id, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_events_func ON events (func_signature, ts)",
+    "CREATE INDEX IF NOT EXISTS idx_events_tag ON events (tag)",
+    "CREATE INDEX IF NOT EXISTS idx_events_level ON events (level, ts)"
+]
+
+_INSERT = (
+    "INSERT INTO events (ts, log_type, subsystem, level, tag, user_id, project_id, task_id, "
+    "session_id, func_signature, elapsed_time_sec, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def connect(path=DEFAULT_SQLITE_PATH):
+    """Opens the event database in WAL mode, creating the schema if needed."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    with conn:
+        for statement in _SCHEMA:
+            conn.execute(statement)
+    return conn
+
+
+class SQLiteSink(BatchingSink):
+    """Bulk-inserts events into SQLite: indexed columns for the record_event fields, full event as JSON."""
+
+    def __init__(self, path=DEFAULT_SQLITE_PATH, batch_size=1000, **batch_options):
+        super().__init__(batch_size=batch_size, **batch_options)
+        self.path = path
+        self._conn = None
+        self._conn_lock = threading.Lock()
+
+    def extract_fields(self, log_data):
+        fields = super().extract_fields(log_data)
+        payload = log_data.get("payload")
+        func_signature = elapsed = None
+        if isinstance(payload, dict):
+            func = payload.get("__func__")
+            if "__fid__" in payload:
+                func_signature = signature_for(payload["__fid__"])
+            elif func is not None and not isinstance(func, str):
+                func_signature = _generate_signature(func)
+            elapsed = payload.get("elapsed_time_sec")
+            if not isinstance(elapsed, (int, float)):
+                elapsed = None
+        fields["func_signature"] = func_signature
+        fields["elapsed_time_sec"] = elapsed
+        return fields
+
+    def send(self, batch):
+        rows = [
+            (
+                fields.get("__ts__") or datetime.utcnow().isoformat(),
+                log_type,
+                fields.get("subsystem"),
+                fields.get("level"),
+                fields.get("tag"),
+                fields.get("user_id"),
+                fields.get("project_id"),
+                fields.get("task_id"),
+                fields.get("session_id"),
+                fields.get("func_signature"),
+                fields.get("elapsed_time_sec"),
+                line
+            )
+            for log_type, line, fields in batch
+        ]
+        with self._conn_lock:
+            if self._conn is None:
+                self._conn = connect(self.path)
+            with self._conn:
+                self._conn.executemany(_INSERT, rows)
+
+    def _shutdown(self):
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+register_sink_type("sqlite", SQLiteSink)
+
+
+# === Retention ===
+def purge_time_range(path=DEFAULT_SQLITE_PATH, start=None, end=None, chunk_size=10000):
+    """Deletes events with start <= ts < end (ISO strings, either bound optional) in small transactions."""
+    if not os.path.exists(path):
+        return 0
+    clauses, params = [], []
+    if start is not None:
+        clauses.append("ts >= ?")
+        params.append(start)
+    if end is not None:
+        clauses.append("ts < ?")
+        params.append(end)
+    where = " AND ".join(clauses) or "1"
+
+    deleted = 0
+    conn = connect(path)
+    try:
+        while True:
+            with conn:
+                cursor = conn.execute(
+                    f"DELETE FROM events WHERE id IN (SELECT id FROM events WHERE {where} LIMIT ?)",
+                    (*params, chunk_size)
+                )
+            deleted += cursor.rowcount
+            if cursor.rowcount < chunk_size:
+                break
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    return deleted
+
+
+def configured_sqlite_paths():
+    return [
+        spec.get("path", DEFAULT_SQLITE_PATH)
+        for spec in BLACKBOX_SETTINGS.get("sinks") or []
+        if isinstance(spec, dict) and spec.get("type") == "sqlite"
+    ]
+
+
+def purge_older_than(days, path=DEFAULT_SQLITE_PATH):
+    cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
+    return purge_time_range(path, end=cutoff)
+
+
+# === Benchmark ===
+def benchmark_insert_throughput(events=20000, batch_size=1000):
+    """Compares events/sec of the SQLite sink against the local JSONL writer."""
+    def make_event(i):
+        return {
+            "__ts__": datetime.utcnow().isoformat(),
+            "subsystem": "internal",
+            "tag": "[Autolog] Exit: benchmark",
+            "level": "info",
+            "user_id": "benchmark",
+            "project_id": "benchmark",
+            "task_id": f"task-{i % 50}",
+            "session_id": "benchmark",
+            "payload": {"result_preview": "x" * 40, "elapsed_time_sec": 0.0012}
+        }
+
+    results = {}
+    tmp_dir = tempfile.mkdtemp(prefix="fungus-sqlite-bench-")
+    try:
+        # Same layout as the live writer, but under tmp_dir so the real log tree is never touched
+        started = time.perf_counter()
+        for i in range(events):
+            write_local_log("internal", make_event(i), root=tmp_dir)
+        results["jsonl_events_per_sec"] = round(events / (time.perf_counter() - started))
+        flush_shard_indexes()
+
+        sink = SQLiteSink(os.path.join(tmp_dir, "bench.sqlite3"), batch_size=batch_size)
+        started = time.perf_counter()
+        batch = []
+        for i in range(events):
+            event = make_event(i)
+            batch.append(("internal", _safe_serialize(event), sink.extract_fields(event)))
+            if len(batch) >= batch_size:
+                sink.send(batch)
+                batch = []
+        if batch:
+            sink.send(batch)
+        results["sqlite_events_per_sec"] = round(events / (time.perf_counter() - started))
+        sink._shutdown()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"[SQLiteSink] JSONL: {results['jsonl_events_per_sec']} events/s, "
+          f"SQLite (batch {batch_size}): {results['sqlite_events_per_sec']} events/s")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_insert_throughput()
@@ -0,0 +1,367 @@
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+from fungus.blackbox_config import BLACKBOX_SETTINGS
+
+
+# === Self-Observability ===
+DEFAULT_SELF_METRICS = {
+    "interval_sec": 60,
+    "http_port": None,
+    "unix_socket": None
+}
+
+# Upper bounds in seconds for latency histograms (Prometheus-style cumulative buckets)
+LATENCY_BUCKETS = (
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+_HELP = {
+    "record_event_total": "Events passed to record_event",
+    "record_event_seconds": "Time spent inside record_event",
+    "writes_total": "Events appended to local JSONL files",
+    "write_seconds": "Latency of local JSONL appends",
+    "bytes_written_total": "Bytes appended to local JSONL files",
+    "write_errors_total": "Local writes that failed",
+    "files_open": "Log files currently open in the writer",
+    "tag_for_context_total": "Calls to tag_for_context",
+    "tag_cache_hits_total": "tag_for_context signature cache hits",
+    "tag_cache_misses_total": "tag_for_context signature cache misses (first seen)",
+    "tag_for_context_seconds": "Time spent inside tag_for_context",
+    "wrapped_calls_total": "Calls through blackbox_wrap",
+    "wrap_overhead_seconds": "Time spent in blackbox_wrap outside the wrapped function",
+    "wrapped_function_seconds": "Time spent in wrapped functions",
+    "retention_runs_total": "Retention policy runs",
+    "retention_seconds": "Duration of retention policy runs",
+    "retention_archived_bytes_total": "Bytes compressed by retention",
+    "retention_deleted_bytes_total": "Bytes of shard/segment days deleted by retention"
+}
+
+# Hot-path updates go to a per-thread shard without locking; _lock is only taken to register a
+# shard and when stats() / prometheus_text() sum the shards up.
+_lock = threading.Lock()
+_local = threading.local()
+_shards = []
+_gauges = {}  # absolute values from set_gauge; add_gauge deltas live in the shards
+_started_at = time.time()
+_metrics_thread = None
+_servers = []
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation; None if it is past the last bound."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else None
+        return None
+
+    @property
+    def overflow(self):
+        return self.counts[-1]
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.sum += other.sum
+
+
+class _Shard:
+    __slots__ = ("counters", "histograms", "gauges", "thread")
+
+    def __init__(self, thread):
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+        self.thread = thread
+
+
+_retired = _Shard(None)  # totals of threads that have exited
+
+
+def _new_shard():
+    shard = _local.shard = _Shard(threading.current_thread())
+    with _lock:
+        _retire_dead()
+        _shards.append(shard)
+    return shard
+
+
+def _shard():
+    try:
+        return _local.shard
+    except AttributeError:
+        return _new_shard()
+
+
+def incr(name, value=1):
+    counters = _shard().counters
+    counters[name] = counters.get(name, 0) + value
+
+
+def observe(name, value):
+    histograms = _shard().histograms
+    histogram = histograms.get(name)
+    if histogram is None:
+        histogram = histograms[name] = Histogram()
+    histogram.observe(value)
+
+
+def set_gauge(name, value):
+    with _lock:
+        _gauges[name] = value
+        for shard in _shards + [_retired]:
+            shard.gauges.pop(name, None)
+
+
+def add_gauge(name, delta):
+    gauges = _shard().gauges
+    gauges[name] = gauges.get(name, 0) + delta
+
+
+def _fold(target, shard):
+    # dict() copies are taken while the owning thread may still be updating its shard
+    for name, value in dict(shard.counters).items():
+        target.counters[name] = target.counters.get(name, 0) + value
+    for name, value in dict(shard.gauges).items():
+        target.gauges[name] = target.gauges.get(name, 0) + value
+    for name, histogram in dict(shard.histograms).items():
+        merged = target.histograms.get(name)
+        if merged is None:
+            merged = target.histograms[name] = Histogram(histogram.bounds)
+        merged.merge(histogram)
+
+
+def _retire_dead():
+    """Folds the shards of finished threads into _retired (caller holds _lock)."""
+    dead = [s for s in _shards if not s.thread.is_alive()]
+    for shard in dead:
+        _shards.remove(shard)
+        _fold(_retired, shard)
+
+
+def _collect():
+    """Sums all shards into one (caller holds _lock); shards of finished threads are retired."""
+    _retire_dead()
+    total = _Shard(None)
+    for shard in _shards + [_retired]:
+        _fold(total, shard)
+    for name, value in _gauges.items():
+        total.gauges[name] = total.gauges.get(name, 0) + value
+    return total
+
+
+def _subsystem_gauges():
+    """Pulls status from subsystems that are already loaded, without importing new ones."""
+    gauges = {}
+    writer = sys.modules.get("fungus.blackbox_writer")
+    if writer is not None:
+        status = writer.writer_status()
+        gauges["writer_degraded"] = int(status["degraded"])
+        gauges["writer_spill_size"] = status["spill_size"]
+        gauges["writer_dropped"] = status["dropped"]
+        gauges["writer_fallback_dropped"] = status["fallback_dropped"]
+    recorder = sys.modules.get("fungus.blackbox_recorder")
+    if recorder is not None:
+        status = recorder.flight_recorder_status()
+        gauges["flight_recorder_buffered"] = status["buffered"]
+        gauges["flight_recorder_overwritten"] = status["overwritten"]
+        gauges["flight_recorder_evicted"] = status["evicted"]
+    sinks = sys.modules.get("fungus.blackbox_sinks")
+    if sinks is not None:
+        for sink in sinks._active_sinks or []:
+            counters = getattr(sink, "counters", None)
+            if counters:
+                name = type(sink).__name__
+                gauges[f"sink_{name}_dropped"] = counters["dropped"]
+                gauges[f"sink_{name}_retries"] = counters["retries"]
+                gauges[f"sink_{name}_queue_size"] = sink._queue.qsize()
+    return gauges
+
+
+def stats():
+    """Snapshot of Fungus' own counters, histograms and gauges, plus a few derived rates."""
+    with _lock:
+        total = _collect()
+    counters, gauges = total.counters, total.gauges
+    histograms = {
+        name: {
+            "count": h.count,
+            "sum": h.sum,
+            "avg": h.sum / h.count if h.count else None,
+            "p50": h.quantile(0.5),
+            "p99": h.quantile(0.99),
+            "over_last_bucket": h.overflow
+        }
+        for name, h in total.histograms.items()
+    }
+    gauges.update(_subsystem_gauges())
+
+    uptime = max(time.time() - _started_at, 1e-9)
+    tag_lookups = counters.get("tag_cache_hits_total", 0) + counters.get("tag_cache_misses_total", 0)
+    overhead = histograms.get("wrap_overhead_seconds", {}).get("sum", 0.0)
+    wrapped = histograms.get("wrapped_function_seconds", {}).get("sum", 0.0)
+    return {
+        "uptime_sec": uptime,
+        "events_per_sec": counters.get("record_event_total", 0) / uptime,
+        "tag_cache_hit_rate": counters.get("tag_cache_hits_total", 0) / tag_lookups if tag_lookups else None,
+        "wrap_overhead_ratio": overhead / wrapped if wrapped else None,
+        "counters": counters,
+        "gauges": gauges,
+        "histograms": histograms
+    }
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def prometheus_text():
+    """Renders the metrics in the Prometheus text exposition format."""
+    with _lock:
+        total = _collect()
+    counters, gauges = total.counters, total.gauges
+    histograms = {name: (h.bounds, h.counts, h.count, h.sum) for name, h in total.histograms.items()}
+    gauges.update(_subsystem_gauges())
+
+    lines = []
+    for name, value in sorted(counters.items()):
+        metric = f"fungus_{name}"
+        lines += [f"# HELP {metric} {_HELP.get(name, name)}", f"# TYPE {metric} counter", f"{metric} {_format_value(value)}"]
+    for name, value in sorted(gauges.items()):
+        metric = f"fungus_{name}"
+        lines += [f"# HELP {metric} {_HELP.get(name, name)}", f"# TYPE {metric} gauge", f"{metric} {_format_value(value)}"]
+    for name, (bounds, counts, count, total) in sorted(histograms.items()):
+        metric = f"fungus_{name}"
+        lines += [f"# HELP {metric} {_HELP.get(name, name)}", f"# TYPE {metric} histogram"]
+        cumulative = 0
+        for bound, n in zip(list(bounds) + [float("inf")], counts):
+            cumulative += n
+            lines.append(f'{metric}_bucket{{le="{_format_value(bound)}"}} {cumulative}')
+        lines += [f"{metric}_sum {_format_value(total)}", f"{metric}_count {count}"]
+    return "\n".join(lines) + "\n"
+
+
+def reset_stats():
+    global _started_at
+    with _lock:
+        for shard in _shards + [_retired]:
+            shard.counters.clear()
+            shard.histograms.clear()
+            shard.gauges.clear()
+        _gauges.clear()
+        _started_at = time.time()
+
+
+# === Periodic Record + Endpoint ===
+def _self_metrics_config():
+    return {**DEFAULT_SELF_METRICS, **BLACKBOX_SETTINGS.get("self_metrics", {})}
+
+
+def write_self_metrics():
+    import json
+    from fungus.blackbox_writer import write_blackbox_log
+
+    snapshot = stats()
+    # Raises on NaN / Infinity, which would make the record unparseable as JSON
+    json.dumps(snapshot, allow_nan=False)
+    write_blackbox_log("internal", {
+        "__ts__": datetime.utcnow().isoformat(),
+        "tag": "[Fungus] Self metrics",
+        "level": "info",
+        "pid": os.getpid(),
+        **snapshot
+    })
+
+
+def _self_metrics_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_self_metrics()
+        except Exception as e:
+            print(f"[Stats] Failed to write self metrics: {e}")
+
+
+def serve_metrics(http_port=None, unix_socket=None):
+    """Serves prometheus_text() on localhost HTTP (/metrics) and/or a Unix stream socket."""
+    import socketserver
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    started = []
+    if http_port is not None:
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", http_port), MetricsHandler)
+        server.daemon_threads = True
+        started.append(server)
+
+    if unix_socket:
+        class SocketHandler(socketserver.BaseRequestHandler):
+            def handle(self):
+                self.request.sendall(prometheus_text().encode("utf-8"))
+
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = socketserver.ThreadingUnixStreamServer(unix_socket, SocketHandler)
+        server.daemon_threads = True
+        started.append(server)
+
+    for server in started:
+        threading.Thread(target=server.serve_forever, name="fungus-metrics", daemon=True).start()
+    _servers.extend(started)
+    return started
+
+
+def start_self_metrics():
+    """Starts the periodic self-metrics record and the configured metrics endpoint(s), once."""
+    global _metrics_thread
+    if _metrics_thread is not None:
+        return
+    config = _self_metrics_config()
+    if config["interval_sec"]:
+        _metrics_thread = threading.Thread(
+            target=_self_metrics_loop, args=(config["interval_sec"],), name="fungus-self-metrics", daemon=True
+        )
+        _metrics_thread.start()
+    if config["http_port"] is not None or config["unix_socket"]:
+        serve_metrics(config["http_port"], config["unix_socket"])
@@ -1,16 +1,19 @@
 import importlib
-import inspect
 import json
 import os
 import threading
-import yaml
 from datetime import datetime
-from pathlib import Path
+from time import perf_counter
 
 from fungus.blackbox_config import LOG_PATHS
+from fungus.blackbox_metadata import define_function, lookup, metadata_enabled
+from fungus.blackbox_stats import incr, observe
 
 # === Config Loader ===
 def _load_config():
+    import yaml
+    from pathlib import Path
+
     anchor = "dynamics/config.yaml"
     current = Path(__file__).resolve().parent
     for parent in [current] + list(current.parents):
@@ -59,14 +62,15 @@ TAG_HISTORY_PATH = _get_tag_path("tag_history.jsonl")
 TAG_MANIFEST_PATH = _get_tag_path("tag_manifest.yaml")
 GPT_TAGS_PATH = _get_tag_path("telephone_generated_tags.yaml")
 
-os.makedirs(LOG_PATHS["internal"], exist_ok=True)
-
-_static_tag_rules = {}
+# None until the rule files have been read once; an empty rule set is cached too
+_static_tag_rules = None
 
 def _load_yaml(path):
     if not os.path.exists(path):
         return {}
     try:
+        import yaml
+
         with open(path, "r", encoding="utf-8") as f:
             return yaml.safe_load(f) or {}
     except Exception as e:
@@ -75,13 +79,15 @@ def _load_yaml(path):
 
 def _load_static_tag_rules():
     global _static_tag_rules
-    if not _static_tag_rules:
+    if _static_tag_rules is None:
         manifest_tags = _load_yaml(TAG_MANIFEST_PATH)
         telephone_tags = _load_yaml(GPT_TAGS_PATH)
         _static_tag_rules = {**manifest_tags, **telephone_tags}
     return _static_tag_rules
 
 def _get_module_path(obj):
+    import inspect
+
     try:
         mod = inspect.getmodule(obj)
         return mod.__name__ if mod else "unknown"
@@ -89,6 +95,8 @@ def _get_module_path(obj):
         return "unknown"
 
 def _get_file_path(obj):
+    import inspect
+
     try:
         file = inspect.getfile(obj)
         return os.path.relpath(file)
@@ -107,6 +115,7 @@ def _record_signature_history(signature, tags):
         "tags": tags
     }
     try:
+        os.makedirs(os.path.dirname(TAG_HISTORY_PATH), exist_ok=True)
         with open(TAG_HISTORY_PATH, "a", encoding="utf-8") as f:
             f.write(json.dumps(entry, ensure_ascii=False) + "\n")
     except Exception as e:
@@ -131,6 +140,14 @@ def _apply_static_tags(ctx, result):
     return tags
 
 def tag_for_context(obj=None, ctx=None, result=None):
+    start = perf_counter()
+    try:
+        return _tag_for_context(obj, ctx, result)
+    finally:
+        incr("tag_for_context_total")
+        observe("tag_for_context_seconds", perf_counter() - start)
+
+def _tag_for_context(obj, ctx, result):
     ctx = ctx or {}
     tags = []
 
@@ -147,26 +164,37 @@ def tag_for_context(obj=None, ctx=None, result=None):
             tags.append(f"model:{model}")
 
     if obj:
-        name = getattr(obj, "__name__", "unknown")
-        mod = _get_module_path(obj)
-        file = _get_file_path(obj)
-        signature = _generate_signature(obj)
+        if metadata_enabled():
+            # Static metadata lives in the metadata dictionary; the event only carries its id
+            record = lookup(define_function(obj))
+            name, mod, file = record["name"], record["module"], record["file"]
+            signature = f"{mod}.{name}"
+        else:
+            name = getattr(obj, "__name__", "unknown")
+            mod = _get_module_path(obj)
+            file = _get_file_path(obj)
+            signature = _generate_signature(obj)
 
         if mod and ("tag_engine" in mod or "tag_engine" in file):
             return tags
 
-        tags.extend([
-            f"func:{name}",
-            f"module:{mod}",
-            f"file:{file}"
-        ])
+        if metadata_enabled():
+            tags.append(f"fn:{record['fid']}")
+        else:
+            tags.extend([
+                f"func:{name}",
+                f"module:{mod}",
+                f"file:{file}"
+            ])
 
         with _tag_lock:
             if signature not in _seen_signatures:
                 tags.append("first_seen:true")
                 _seen_signatures.add(signature)
                 _record_signature_history(signature, tags)
+                incr("tag_cache_misses_total")
             else:
                 tags.append("first_seen:false")
+                incr("tag_cache_hits_total")
 
     return list(set(tags))
@@ -1,16 +1,19 @@
 import os
 import json
-import yaml
 import importlib
-from pathlib import Path
 from collections import Counter, defaultdict
 
-from fungus.blackbox_config import LOG_PATHS
+from fungus.blackbox_config import BLACKBOX_SETTINGS, LOG_PATHS
+from fungus.blackbox_metadata import DICTIONARY_NAME, resolve_event, signature_for
+from fungus.blackbox_sketches import CountMinSketch, HyperLogLog, MisraGries
 from fungus.blackbox_tag_engine import _generate_signature  # ✅ fixed import
 
 
 # === Config Loader ===
 def _load_config():
+    import yaml
+    from pathlib import Path
+
     anchor = "dynamics/config.yaml"
     current = Path(__file__).resolve().parent
     for parent in [current] + list(current.parents):
@@ -53,21 +56,145 @@ TAG_REPORT_PATH = os.path.join(LOG_PATHS["internal"], "tag_report.json")
 TAG_YAML_PATH = os.path.join(LOG_PATHS["internal"], "tag_templates.yaml")
 TAG_HISTORY_PATH = os.path.join(LOG_PATHS["internal"], "tag_history.jsonl")
 
-
-def scan_logs_for_tags(limit_per_file=1000):
-    tag_counter = Counter()
-    missing_tags = defaultdict(list)
-    candidate_suggestions = defaultdict(Counter)
-    seen_signatures = set()
-
-    print("[TagTrainer] Scanning logs...")
-
-    for fname in os.listdir(LOG_PATHS["internal"]):
-        if not fname.endswith(".jsonl"):
-            continue
-
+DEFAULT_TRAINER = {
+    "top_k": 64,
+    "cms_width": 65536,
+    "cms_depth": 4,
+    "hll_precision": 10,
+    "max_distinct_values": 100,
+    "max_fields": 512,
+    "max_missing_groups": 1000,
+    "examples_per_group": 10
+}
+
+
+def _trainer_config():
+    return {**DEFAULT_TRAINER, **BLACKBOX_SETTINGS.get("tag_trainer", {})}
+
+
+class TagTrainerState:
+    """Fixed-memory scan result: sketches instead of exact per-value counters.
+
+    Counts come from one shared count-min sketch, candidates from Misra-Gries top-k
+    and per-field cardinality from HyperLogLog, so memory does not grow with the
+    number of distinct values. States from separate workers combine with merge().
+    """
+
+    def __init__(self, config=None):
+        self.config = config or _trainer_config()
+        self.counts = CountMinSketch(self.config["cms_width"], self.config["cms_depth"])
+        self.top_tags = MisraGries(self.config["top_k"])
+        self.tagged_events = 0
+        self.missing = {}  # tag type -> [event count, first few task ids]
+        self.missing_overflow = 0
+        self.fields = {}  # payload key -> (MisraGries of values, HyperLogLog of values)
+        self.fields_overflow = 0
+        self.signatures = set()
+
+    def _field(self, key):
+        field = self.fields.get(key)
+        if field is None:
+            if len(self.fields) >= self.config["max_fields"]:
+                return None
+            field = self.fields[key] = (MisraGries(self.config["top_k"]), HyperLogLog(self.config["hll_precision"]))
+        return field
+
+    def add_missing(self, tag_type, task_id, count=1):
+        group = self.missing.get(tag_type)
+        if group is None:
+            if len(self.missing) >= self.config["max_missing_groups"]:
+                self.missing_overflow += count
+                return
+            group = self.missing[tag_type] = [0, []]
+        group[0] += count
+        if len(group[1]) < self.config["examples_per_group"] and task_id not in group[1]:
+            group[1].append(task_id)
+
+    def add_entry(self, entry):
+        payload = entry.get("payload")
+        fid = payload.get("__fid__") if isinstance(payload, dict) else None
+        entry = resolve_event(entry)
+        tags = entry.get("tags", [])
+        payload = entry.get("payload", {})
+
+        if not tags:
+            tag_type = entry.get("tag") or entry.get("step") or "untagged"
+            self.add_missing(tag_type, entry.get("task_id", "unknown"))
+        else:
+            for tag in tags:
+                self.top_tags.update(tag)
+                self.counts.update(f"tag\0{tag}")
+            self.tagged_events += len(tags)
+
+        if isinstance(payload, dict):
+            for k, v in payload.items():
+                if isinstance(v, (str, int)) and f"{k}:{v}" not in tags:
+                    field = self._field(k)
+                    if field is None:
+                        self.fields_overflow += 1
+                        continue
+                    value = str(v)
+                    field[0].update(value)
+                    field[1].update(value)
+                    self.counts.update(f"field\0{k}\0{value}")
+
+            if fid is not None:
+                signature = signature_for(fid)
+                if signature:
+                    self.signatures.add(signature)
+            elif "__func__" in payload:
+                try:
+                    self.signatures.add(_generate_signature(payload["__func__"]))
+                except Exception:
+                    pass
+
+    def merge(self, other):
+        self.counts.merge(other.counts)
+        self.top_tags.merge(other.top_tags)
+        self.tagged_events += other.tagged_events
+        for tag_type, (count, examples) in other.missing.items():
+            self.add_missing(tag_type, examples[0] if examples else "unknown", count)
+            group = self.missing.get(tag_type)
+            if group is not None:
+                for task_id in examples[1:]:
+                    if len(group[1]) >= self.config["examples_per_group"]:
+                        break
+                    if task_id not in group[1]:
+                        group[1].append(task_id)
+        self.missing_overflow += other.missing_overflow
+        for key, (values, distinct) in other.fields.items():
+            field = self._field(key)
+            if field is None:
+                self.fields_overflow += values.total
+                continue
+            field[0].merge(values)
+            field[1].merge(distinct)
+        self.fields_overflow += other.fields_overflow
+        self.signatures |= other.signatures
+        return self
+
+    def tag_counts(self, n=50):
+        ranked = [(tag, self.counts.estimate(f"tag\0{tag}")) for tag in self.top_tags.candidates()]
+        return sorted(ranked, key=lambda kv: (-kv[1], kv[0]))[:n]
+
+    def suggestions(self, n=5):
+        """Most common values per payload key, skipping keys with too many distinct values."""
+        suggestions, excluded = {}, {}
+        for key, (values, distinct) in self.fields.items():
+            cardinality = distinct.estimate()
+            if cardinality > self.config["max_distinct_values"]:
+                excluded[key] = round(cardinality)
+                continue
+            ranked = [(val, self.counts.estimate(f"field\0{key}\0{val}")) for val in values.candidates()]
+            suggestions[key] = sorted(ranked, key=lambda kv: (-kv[1], kv[0]))[:n]
+        return suggestions, excluded
+
+
+def _scan_files(paths, limit_per_file, config=None):
+    state = TagTrainerState(config)
+    for path in paths:
         try:
-            with open(os.path.join(LOG_PATHS["internal"], fname), "r", encoding="utf-8") as f:
+            with open(path, "r", encoding="utf-8") as f:
                 for i, line in enumerate(f):
                     if i >= limit_per_file:
                         break
@@ -76,32 +203,69 @@ def scan_logs_for_tags(limit_per_file=1000):
                         entry = json.loads(line)
                     except json.JSONDecodeError:
                         continue
-
-                    tags = entry.get("tags", [])
-                    payload = entry.get("payload", {})
-                    ctx = {k: v for k, v in entry.items() if isinstance(v, (str, int, float))}
-
-                    if not tags:
-                        tag_type = entry.get("tag") or entry.get("step") or "untagged"
-                        missing_tags[tag_type].append(entry.get("task_id", "unknown"))
-                    else:
-                        tag_counter.update(tags)
-
-                    if isinstance(payload, dict):
-                        for k, v in payload.items():
-                            if isinstance(v, (str, int)) and f"{k}:{v}" not in tags:
-                                candidate_suggestions[k].update([str(v)])
-
-                        if "__func__" in payload:
-                            try:
-                                sig = _generate_signature(payload["__func__"])
-                                seen_signatures.add(sig)
-                            except Exception:
-                                continue
+                    state.add_entry(entry)
         except (OSError, IOError) as e:
-            print(f"[TagTrainer] Failed to read {fname}: {e}")
+            print(f"[TagTrainer] Failed to read {os.path.basename(path)}: {e}")
+    return state
+
 
-    return tag_counter, missing_tags, candidate_suggestions, seen_signatures
+def scan_logs_for_tag_state(limit_per_file=1000, workers=1):
+    """Scans internal/*.jsonl into a TagTrainerState, optionally across worker processes."""
+    print("[TagTrainer] Scanning logs...")
+
+    internal_files = os.listdir(LOG_PATHS["internal"]) if os.path.isdir(LOG_PATHS["internal"]) else []
+    paths = [
+        os.path.join(LOG_PATHS["internal"], fname) for fname in internal_files
+        if fname.endswith(".jsonl") and fname != DICTIONARY_NAME
+    ]
+    config = _trainer_config()
+
+    if workers <= 1 or len(paths) < 2:
+        return _scan_files(paths, limit_per_file, config)
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunks = [paths[i::workers] for i in range(workers) if paths[i::workers]]
+    state = TagTrainerState(config)
+    with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+        for partial in pool.map(_scan_files, chunks, [limit_per_file] * len(chunks), [config] * len(chunks)):
+            state.merge(partial)
+    return state
+
+
+def scan_logs_for_tags(limit_per_file=1000, workers=1):
+    """Compatibility wrapper returning (tag_counter, missing_tags, candidate_suggestions, seen_signatures).
+
+    Built from the sketches, so counts are estimates, tags and values are limited to the top-k
+    candidates and missing_tags holds up to examples_per_group distinct task ids per tag type.
+    """
+    state = scan_logs_for_tag_state(limit_per_file, workers)
+    tag_counter = Counter(dict(state.tag_counts(n=None)))
+    missing_tags = defaultdict(list, {tag_type: list(examples) for tag_type, (_, examples) in state.missing.items()})
+    candidate_suggestions = defaultdict(Counter)
+    for key, (values, _) in state.fields.items():
+        candidate_suggestions[key] = Counter({val: state.counts.estimate(f"field\0{key}\0{val}") for val in values.candidates()})
+    return tag_counter, missing_tags, candidate_suggestions, state.signatures
+
+
+def _state_from_counts(tag_counter, missing_tags, suggestions):
+    state = TagTrainerState()
+    for tag, count in tag_counter.items():
+        state.top_tags.update(tag, count)
+        state.counts.update(f"tag\0{tag}", count)
+        state.tagged_events += count
+    for tag_type, task_ids in missing_tags.items():
+        for task_id in task_ids:
+            state.add_missing(tag_type, task_id)
+    for key, values in suggestions.items():
+        field = state._field(key)
+        if field is None:
+            continue
+        for val, count in values.items():
+            field[0].update(val, count)
+            field[1].update(val)
+            state.counts.update(f"field\0{key}\0{val}", count)
+    return state
 
 
 def load_tag_history():
@@ -119,17 +283,23 @@ def load_tag_history():
     return seen
 
 
-def write_tag_report(tag_counter, missing_tags, suggestions, signatures_used):
+def write_tag_state_report(state, signatures_used):
+    suggestions, excluded = state.suggestions()
     report = {
-        "top_tags": tag_counter.most_common(50),
-        "missing_tag_groups": {k: v[:10] for k, v in missing_tags.items()},
+        "top_tags": state.tag_counts(50),
+        "missing_tag_groups": {k: examples for k, (_, examples) in state.missing.items()},
+        "excluded_high_cardinality_fields": excluded,
         "summary": {
-            "total_tagged_events": sum(tag_counter.values()),
-            "missing_tag_types": len(missing_tags),
+            "total_tagged_events": state.tagged_events,
+            "missing_tag_types": len(state.missing),
+            "missing_tag_overflow_events": state.missing_overflow,
+            "untracked_field_values": state.fields_overflow,
             "known_function_signatures": len(signatures_used),
+            "count_error_bound": round(state.counts.error_bound(), 2)
         }
     }
 
+    os.makedirs(os.path.dirname(TAG_REPORT_PATH), exist_ok=True)
     with open(TAG_REPORT_PATH, "w", encoding="utf-8") as f:
         json.dump(report, f, indent=2)
 
@@ -139,10 +309,12 @@ def write_tag_report(tag_counter, missing_tags, suggestions, signatures_used):
     if suggestions:
         for key, values in suggestions.items():
             yaml_lines.append(f"{key}:")
-            for val, count in values.most_common(5):
-                yaml_lines.append(f"  - {val}  # Seen {count} times")
+            for val, count in values:
+                yaml_lines.append(f"  - {val}  # Seen ~{count} times")
     else:
         yaml_lines.append("# (No suggestions available)")
+    for key, cardinality in excluded.items():
+        yaml_lines.append(f"# {key}: skipped, ~{cardinality} distinct values")
 
     with open(TAG_YAML_PATH, "w", encoding="utf-8") as f:
         f.write("\n".join(yaml_lines))
@@ -150,10 +322,15 @@ def write_tag_report(tag_counter, missing_tags, suggestions, signatures_used):
     print(f"[TagTrainer] Tag template suggestions written to {TAG_YAML_PATH}")
 
 
-def train_tags():
-    tag_counts, missing, suggestions, signatures_used = scan_logs_for_tags()
+def write_tag_report(tag_counter, missing_tags, suggestions, signatures_used):
+    """Compatibility wrapper taking the counters returned by scan_logs_for_tags()."""
+    write_tag_state_report(_state_from_counts(tag_counter, missing_tags, suggestions), signatures_used)
+
+
+def train_tags(workers=1):
+    state = scan_logs_for_tag_state(workers=workers)
     all_historical_sigs = load_tag_history()
-    write_tag_report(tag_counts, missing, suggestions, all_historical_sigs.union(signatures_used))
+    write_tag_state_report(state, all_historical_sigs.union(state.signatures))
 
 
 if __name__ == "__main__":
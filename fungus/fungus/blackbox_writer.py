@@ -1,15 +1,23 @@
 import os
+import sys
 import json
-import yaml
+import time
+import errno
+import threading
 import importlib
+from collections import deque
 from datetime import datetime
-from pathlib import Path
 
 from fungus.blackbox_config import BLACKBOX_PATH, BLACKBOX_SETTINGS
+from fungus.blackbox_shards import append_sharded, sharded_layout_enabled
+from fungus.blackbox_stats import add_gauge, incr, observe
 
 
 # === Config Loader ===
 def _load_config():
+    import yaml
+    from pathlib import Path
+
     anchor = "dynamics/config.yaml"
     current = Path(__file__).resolve().parent
     for parent in [current] + list(current.parents):
@@ -48,14 +56,14 @@ def resolve_module(name):
 
 
 # === Logging Functions ===
-def _get_log_file_path(log_type, log_data):
+def _get_log_file_path(log_type, log_data, root=None):
     user_id = log_data.get("user_id", "anon")
     project_id = log_data.get("project_id", "unknown")
     task_id = log_data.get("task_id", "unknown")
     date = datetime.utcnow().strftime("%Y-%m-%d")
 
     folder = os.path.join(
-        BLACKBOX_PATH,
+        root or BLACKBOX_PATH,
         f"user_{user_id}",
         f"project_{project_id}",
         f"task_{task_id}",
@@ -78,6 +86,203 @@ def _safe_serialize(data):
         return json.dumps(data, default=default, ensure_ascii=False)
 
 
+# === Degraded Mode ===
+DEFAULT_DEGRADATION = {
+    "mode": "spill",
+    "slow_write_sec": 0.5,
+    "slow_writes_to_degrade": 3,
+    "spill_max_events": 10000,
+    "probe_interval_sec": 5,
+    "fallback_max_mb": 50,
+    "fallback_max_chars": 2000
+}
+
+# Errors that mean the disk itself is in trouble, so writing a fallback entry would only add to it
+_DISK_ERRNOS = {
+    code for code in (
+        errno.ENOSPC,
+        getattr(errno, "EDQUOT", None),
+        errno.EIO,
+        errno.EROFS
+    ) if code is not None
+}
+
+_writer_lock = threading.Lock()
+_spill = deque()
+_prober = None
+_status = {
+    "degraded": False,
+    "reason": None,
+    "since": None,
+    "slow_streak": 0,
+    "spilled": 0,
+    "dropped": 0,
+    "fallback_dropped": 0,
+    "degraded_periods": 0
+}
+
+
+def _degradation_config():
+    return {**DEFAULT_DEGRADATION, **BLACKBOX_SETTINGS.get("writer_degradation", {})}
+
+
+def writer_status():
+    """Snapshot of the writer health: degraded flag, reason and spill/drop counters."""
+    with _writer_lock:
+        return {**_status, "spill_size": len(_spill)}
+
+
+def _append(log_type, log_data, root=None):
+    line = _safe_serialize(log_data) + "\n"
+    if sharded_layout_enabled():
+        shards_dir = os.path.join(root, "shards") if root else None
+        incr("bytes_written_total", append_sharded(log_type, log_data, line, shards_dir))
+        return
+
+    log_path = _get_log_file_path(log_type, log_data, root)
+    try:
+        f = open(log_path, "a", encoding="utf-8")
+    except FileNotFoundError:
+        # The compactor may have pruned the (empty) task folder between makedirs and open
+        f = open(_get_log_file_path(log_type, log_data, root), "a", encoding="utf-8")
+    add_gauge("files_open", 1)
+    try:
+        with f:
+            f.write(line)
+    finally:
+        add_gauge("files_open", -1)
+    incr("bytes_written_total", len(line.encode("utf-8")))
+
+
+def _enter_degraded(reason, config):
+    global _prober
+    with _writer_lock:
+        if _status["degraded"]:
+            return
+        _status.update(degraded=True, reason=reason, since=datetime.utcnow().isoformat(), slow_streak=0)
+        _status["degraded_periods"] += 1
+        if _prober is None or not _prober.is_alive():
+            _prober = threading.Thread(target=_probe_loop, args=(config,), name="fungus-writer-probe", daemon=True)
+            _prober.start()
+    print(f"[BlackboxWriter] Degraded ({config['mode']}): {reason}", file=sys.stderr)
+
+
+def _keep(log_type, log_data, config):
+    """Holds an event in memory while degraded, or counts it as dropped."""
+    mode = config["mode"]
+    keep = mode == "spill" or (mode == "errors_only" and log_data.get("level") == "error")
+    with _writer_lock:
+        if not keep:
+            _status["dropped"] += 1
+            return
+        if len(_spill) >= config["spill_max_events"]:
+            _spill.popleft()
+            _status["dropped"] += 1
+        _spill.append((log_type, log_data))
+        _status["spilled"] += 1
+
+
+def _drain_spill(config):
+    """Writes spilled events in order; the lock is only held to pop or put back one event.
+
+    Returns True once the spill buffer is empty and every write was fast.
+    """
+    while True:
+        with _writer_lock:
+            if not _spill:
+                return True
+            log_type, log_data = _spill.popleft()
+        started = time.monotonic()
+        try:
+            _append(log_type, log_data)
+        except OSError:
+            with _writer_lock:
+                _spill.appendleft((log_type, log_data))
+            return False
+        if time.monotonic() - started > config["slow_write_sec"]:
+            return False
+
+
+def _probe_loop(config):
+    """Background prober: drains the spill buffer and leaves degraded mode once writes are fast again."""
+    while True:
+        time.sleep(config["probe_interval_sec"])
+        if not _drain_spill(config):
+            continue
+
+        with _writer_lock:
+            # The recovery record doubles as the probe write when nothing was spilled
+            summary = {
+                "__ts__": datetime.utcnow().isoformat(),
+                "tag": "[BlackboxWriter] Recovered",
+                "level": "warning",
+                "reason": _status["reason"],
+                "degraded_since": _status["since"],
+                "mode": config["mode"],
+                "dropped": _status["dropped"],
+                "spilled": _status["spilled"]
+            }
+        started = time.monotonic()
+        try:
+            _append("internal", summary)
+        except OSError:
+            continue
+        if time.monotonic() - started > config["slow_write_sec"]:
+            continue
+
+        with _writer_lock:
+            _status.update(degraded=False, reason=None, since=None, slow_streak=0, spilled=0, dropped=0)
+        print(f"[BlackboxWriter] Recovered after {summary['reason']}", file=sys.stderr)
+        # Events kept while the recovery record was being written
+        _drain_spill(config)
+        return
+
+
+def _observe_latency(elapsed, config):
+    if elapsed <= config["slow_write_sec"]:
+        # Unlocked peek keeps the common fast write lock-free; the reset itself is locked
+        if _status["slow_streak"]:
+            with _writer_lock:
+                _status["slow_streak"] = 0
+        return
+    with _writer_lock:
+        _status["slow_streak"] += 1
+        degrade = _status["slow_streak"] >= config["slow_writes_to_degrade"]
+    if degrade:
+        # Takes _writer_lock itself, and only the first caller flips the state
+        _enter_degraded(f"slow writes ({elapsed:.2f}s)", config)
+
+
+def _write_fallback(error, log_data, config):
+    fallback_dir = os.path.join(BLACKBOX_PATH, "internal")
+    fallback_path = os.path.join(fallback_dir, "fallback.jsonl")
+
+    try:
+        if os.path.getsize(fallback_path) >= config["fallback_max_mb"] * 1024 * 1024:
+            with _writer_lock:
+                _status["fallback_dropped"] += 1
+            return
+    except OSError:
+        pass
+
+    original = _safe_serialize(log_data)
+    limit = config["fallback_max_chars"]
+    fallback_entry = {
+        "__ts__": datetime.utcnow().isoformat(),
+        "__error__": str(error),
+        "__original__": original if len(original) <= limit else original[:limit] + "..."
+    }
+
+    try:
+        os.makedirs(fallback_dir, exist_ok=True)
+        with open(fallback_path, "a", encoding="utf-8") as f:
+            f.write(_safe_serialize(fallback_entry) + "\n")
+    except OSError as e:
+        if e.errno not in _DISK_ERRNOS:
+            raise
+        _enter_degraded(f"{errno.errorcode.get(e.errno, e.errno)}: {e}", config)
+
+
 def write_blackbox_log(log_type, log_data, visibility="internal"):
     if not BLACKBOX_SETTINGS.get("write_logs", True):
         return
@@ -85,20 +290,50 @@ def write_blackbox_log(log_type, log_data, visibility="internal"):
     if "__ts__" not in log_data:
         log_data["__ts__"] = datetime.utcnow().isoformat()
 
+    # Configured sinks (collectors, stdout, ...) replace the local files unless "jsonl" is listed
+    if BLACKBOX_SETTINGS.get("sinks"):
+        from fungus.blackbox_sinks import dispatch
+        dispatch(log_type, log_data, visibility)
+        return
+
+    write_local_log(log_type, log_data)
+
+
+def write_local_log(log_type, log_data, root=None):
+    """Appends one event to the local per-task JSONL tree, degrading if the disk misbehaves.
+
+    With root the event goes under that directory instead of BLACKBOX_PATH (benchmarks);
+    errors are then raised and the degraded state is left alone.
+    """
+    if root is not None:
+        _append(log_type, log_data, root)
+        return
+
+    config = _degradation_config()
+    if _status["degraded"]:
+        _keep(log_type, log_data, config)
+        if not _status["degraded"]:
+            # Recovered between the check and _keep: the prober's last drain may have missed this event
+            _drain_spill(config)
+        return
+
+    started = time.monotonic()
     try:
-        log_path = _get_log_file_path(log_type, log_data)
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(_safe_serialize(log_data) + "\n")
+        _append(log_type, log_data)
+    except OSError as e:
+        incr("write_errors_total")
+        if e.errno in _DISK_ERRNOS:
+            _enter_degraded(f"{errno.errorcode.get(e.errno, e.errno)}: {e}", config)
+            _keep(log_type, log_data, config)
+            return
+        _write_fallback(e, log_data, config)
+        return
     except Exception as e:
-        fallback_dir = os.path.join(BLACKBOX_PATH, "internal")
-        os.makedirs(fallback_dir, exist_ok=True)
-        fallback_path = os.path.join(fallback_dir, "fallback.jsonl")
-
-        fallback_entry = {
-            "__ts__": datetime.utcnow().isoformat(),
-            "__error__": str(e),
-            "__original__": str(log_data)
-        }
+        incr("write_errors_total")
+        _write_fallback(e, log_data, config)
+        return
 
-        with open(fallback_path, "a", encoding="utf-8") as f:
-            f.write(_safe_serialize(fallback_entry) + "\n")
+    elapsed = time.monotonic() - started
+    incr("writes_total")
+    observe("write_seconds", elapsed)
+    _observe_latency(elapsed, config)